@@ -0,0 +1,48 @@
+from beanie import Document, PydanticObjectId, DecimalAnnotation
+from pydantic import BaseModel
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Optional
+
+class SalesRollup(Document):
+    """
+    Revenue counters per UTC day, maintained incrementally from orders.
+
+    Two kinds of rows share the collection: one per (day, product, sku) with
+    units/revenue, and one per day with product_id/variant_sku unset holding
+    the day's totals, including the order count.
+    """
+    day: datetime
+    product_id: Optional[PydanticObjectId] = None
+    variant_sku: Optional[str] = None
+    # Title at the time of the last counted sale, for display
+    title: Optional[str] = None
+    orders: int = 0
+    units: int = 0
+    revenue: DecimalAnnotation = Decimal("0.00")
+
+    class Settings:
+        name = "sales_rollups"
+        indexes = [
+            IndexModel(
+                [("day", ASCENDING), ("product_id", ASCENDING), ("variant_sku", ASCENDING)],
+                name="day_product_sku",
+                unique=True,
+            ),
+        ]
+
+class DailySales(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: Decimal
+
+class ProductSales(BaseModel):
+    product_id: str
+    title: Optional[str] = None
+    units: int
+    revenue: Decimal
+
+class SkuSales(ProductSales):
+    variant_sku: str
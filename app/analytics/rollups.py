@@ -0,0 +1,129 @@
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from bson import Decimal128
+from pymongo import UpdateOne
+
+from app.analytics.models import SalesRollup
+from app.core.config import get_settings
+from app.core.database import get_motor_client
+from app.core.metrics import register_collector
+from app.core.tasks import PeriodicTask
+from app.order.models import Order, OrderStatus, RollupState
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Orders are the queue: PAID orders not yet COUNTED are added to the rollups,
+# COUNTED orders that were cancelled or refunded are subtracted again. The
+# state flip and the counter updates commit in one transaction, so every
+# order is counted (and reversed) exactly once.
+COUNTED_STATUSES = [OrderStatus.PAID.value, OrderStatus.SHIPPED.value]
+REVERSED_STATUSES = [OrderStatus.CANCELLED.value, OrderStatus.REFUNDED.value]
+
+class RollupStats:
+    def __init__(self):
+        self.orders_counted = 0
+        self.orders_reversed = 0
+        self.conflicts = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "orders_counted": self.orders_counted,
+            "orders_reversed": self.orders_reversed,
+            "conflicts": self.conflicts,
+        }
+
+rollup_stats = RollupStats()
+register_collector("sales_rollups", rollup_stats.as_dict)
+
+class BatchConflict(Exception):
+    """An order in the batch changed state mid-apply; retry on the next pass."""
+
+def sales_day(order: Order) -> datetime:
+    # Revenue belongs to the day the order was paid, also when it's reversed later
+    moment = order.paid_at or order.created_at
+    return datetime(moment.year, moment.month, moment.day)
+
+def rollup_updates(orders: List[Order], sign: int) -> List[UpdateOne]:
+    """$inc upserts adding (sign=1) or removing (sign=-1) the orders' sales."""
+    counters = {}
+    titles = {}
+    for order in orders:
+        day = sales_day(order)
+        key = (day, None, None)
+        totals = counters.setdefault(key, [0, 0, Decimal("0")])
+        totals[0] += 1
+        totals[1] += sum(item.quantity for item in order.items)
+        totals[2] += Decimal(str(order.total_amount))
+        for item in order.items:
+            key = (day, item.product_id, item.variant_sku)
+            line = counters.setdefault(key, [0, 0, Decimal("0")])
+            line[0] += 1
+            line[1] += item.quantity
+            line[2] += Decimal(str(item.unit_price)) * item.quantity
+            titles[key] = item.title
+
+    updates = []
+    for (day, product_id, sku), (orders_count, units, revenue) in counters.items():
+        update = {"$inc": {
+            "orders": sign * orders_count,
+            "units": sign * units,
+            "revenue": Decimal128(sign * revenue),
+        }}
+        if sign > 0 and (day, product_id, sku) in titles:
+            update["$set"] = {"title": titles[(day, product_id, sku)]}
+        updates.append(UpdateOne(
+            {"day": day, "product_id": product_id, "variant_sku": sku},
+            update,
+            upsert=True,
+        ))
+    return updates
+
+async def apply_orders(orders: List[Order], statuses: List[str], from_state, to_state: RollupState, sign: int) -> None:
+    ids = [order.id for order in orders]
+    client = get_motor_client()
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            result = await Order.get_motor_collection().update_many(
+                {"_id": {"$in": ids}, "status": {"$in": statuses}, "rollup_state": from_state},
+                {"$set": {"rollup_state": to_state.value}},
+                session=session,
+            )
+            if result.modified_count != len(ids):
+                raise BatchConflict()
+            await SalesRollup.get_motor_collection().bulk_write(
+                rollup_updates(orders, sign), ordered=False, session=session
+            )
+
+async def _drain(statuses: List[str], from_state, to_state: RollupState, sign: int) -> int:
+    applied = 0
+    while True:
+        # Served by the (status, rollup_state) index
+        orders = await Order.find(
+            {"status": {"$in": statuses}, "rollup_state": from_state}
+        ).limit(settings.SALES_ROLLUP_BATCH_SIZE).to_list()
+        if not orders:
+            return applied
+        try:
+            await apply_orders(orders, statuses, from_state, to_state, sign)
+        except BatchConflict:
+            rollup_stats.conflicts += 1
+            return applied
+        applied += len(orders)
+        if len(orders) < settings.SALES_ROLLUP_BATCH_SIZE:
+            return applied
+
+async def update_sales_rollups() -> None:
+    rollup_stats.orders_counted += await _drain(COUNTED_STATUSES, None, RollupState.COUNTED, 1)
+    rollup_stats.orders_reversed += await _drain(
+        REVERSED_STATUSES, RollupState.COUNTED.value, RollupState.REVERSED, -1
+    )
+
+sales_rollup_task = PeriodicTask(
+    "sales_rollups",
+    interval_seconds=settings.SALES_ROLLUP_INTERVAL_SECONDS,
+    fn=update_sales_rollups,
+)
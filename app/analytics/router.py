@@ -0,0 +1,105 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.analytics.models import SalesRollup, DailySales, ProductSales, SkuSales
+from app.auth.dependencies import get_current_admin_user
+from beanie import PydanticObjectId
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+router = APIRouter()
+
+# Everything here reads the sales_rollups collection only, so the cost
+# grows with days x products sold, never with the number of orders.
+
+MAX_RANGE_DAYS = 366
+
+def date_range(
+    start: Optional[date] = Query(None, description="First day (UTC), default 30 days before `end`"),
+    end: Optional[date] = Query(None, description="Last day (UTC), inclusive, default today"),
+) -> Tuple[datetime, datetime]:
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+    return datetime(start.year, start.month, start.day), datetime(end.year, end.month, end.day)
+
+def _decimal(value) -> Decimal:
+    return value.to_decimal() if hasattr(value, "to_decimal") else Decimal(str(value or 0))
+
+@router.get("/daily", response_model=List[DailySales])
+async def daily_sales(days: Tuple[datetime, datetime] = Depends(date_range), admin = Depends(get_current_admin_user)):
+    start, end = days
+    rows = await SalesRollup.get_motor_collection().find(
+        {"day": {"$gte": start, "$lte": end}, "product_id": None, "variant_sku": None},
+        {"day": 1, "orders": 1, "units": 1, "revenue": 1},
+    ).sort("day", 1).to_list(None)
+    return [
+        DailySales(day=row["day"].date(), orders=row["orders"], units=row["units"], revenue=_decimal(row["revenue"]))
+        for row in rows
+    ]
+
+@router.get("/products", response_model=List[ProductSales])
+async def product_sales(
+    days: Tuple[datetime, datetime] = Depends(date_range),
+    limit: int = Query(20, ge=1, le=200),
+    admin = Depends(get_current_admin_user)
+):
+    start, end = days
+    pipeline = [
+        {"$match": {"day": {"$gte": start, "$lte": end}, "product_id": {"$ne": None}}},
+        {"$sort": {"day": 1}},
+        {"$group": {
+            "_id": "$product_id",
+            "title": {"$last": "$title"},
+            "units": {"$sum": "$units"},
+            "revenue": {"$sum": "$revenue"},
+        }},
+        {"$sort": {"revenue": -1}},
+        {"$limit": limit},
+    ]
+    rows = await SalesRollup.get_motor_collection().aggregate(pipeline).to_list(None)
+    return [
+        ProductSales(product_id=str(row["_id"]), title=row["title"], units=row["units"], revenue=_decimal(row["revenue"]))
+        for row in rows
+    ]
+
+@router.get("/skus", response_model=List[SkuSales])
+async def sku_sales(
+    days: Tuple[datetime, datetime] = Depends(date_range),
+    product_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    admin = Depends(get_current_admin_user)
+):
+    start, end = days
+    match = {"day": {"$gte": start, "$lte": end}, "product_id": {"$ne": None}}
+    if product_id:
+        try:
+            match["product_id"] = PydanticObjectId(product_id)
+        except:
+            raise HTTPException(status_code=400, detail="Invalid product ID")
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"day": 1}},
+        {"$group": {
+            "_id": {"product_id": "$product_id", "variant_sku": "$variant_sku"},
+            "title": {"$last": "$title"},
+            "units": {"$sum": "$units"},
+            "revenue": {"$sum": "$revenue"},
+        }},
+        {"$sort": {"revenue": -1}},
+        {"$limit": limit},
+    ]
+    rows = await SalesRollup.get_motor_collection().aggregate(pipeline).to_list(None)
+    return [
+        SkuSales(
+            product_id=str(row["_id"]["product_id"]),
+            variant_sku=row["_id"]["variant_sku"],
+            title=row["title"],
+            units=row["units"],
+            revenue=_decimal(row["revenue"]),
+        )
+        for row in rows
+    ]
@@ -1,12 +1,38 @@
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.auth.models import User, UserRole
 from jose import JWTError, jwt
 from app.core.config import get_settings
+from app.core.cache import TTLCache
+from app.core.versions import VersionWatcher, bump_version
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+PRINCIPAL_REVOCATIONS = "principal_revocations"
+
+# token -> User, so authenticated requests skip the users lookup
+principal_cache = TTLCache(
+    "principal",
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
+principal_revocations = VersionWatcher(
+    PRINCIPAL_REVOCATIONS,
+    poll_seconds=settings.PRINCIPAL_REVOCATION_POLL_SECONDS,
+)
+
+async def revoke_cached_principal(email: str) -> None:
+    """
+    Call after changing a user's role or active flag. Drops the user's cached
+    principals here, and bumps a shared stamp so other workers (and the API,
+    when the change comes from a CLI such as create_admin.py) drop theirs on
+    their next poll.
+    """
+    principal_cache.invalidate_where(lambda _, user: user.email == email)
+    principal_revocations.observe(await bump_version(PRINCIPAL_REVOCATIONS))
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -20,10 +46,25 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
+
+    # Entries are keyed by revocation stamp, so a bump orphans every entry
+    # cached before it; they then age out of the LRU.
+    cache_key = (token, await principal_revocations.current())
+    user = principal_cache.get(cache_key)
+    if user is not None:
+        return user
+
+    generation = principal_cache.generation
     user = await User.find_one(User.email == email)
     if user is None:
         raise credentials_exception
+
+    # Never keep a principal around past its token's expiry
+    ttl = settings.PRINCIPAL_CACHE_TTL_SECONDS
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    principal_cache.set(cache_key, user, ttl_seconds=ttl, generation=generation)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.auth.models import User, UserRole
-from app.auth.security import verify_password, create_access_token, get_password_hash
+from app.auth.security import create_access_token, hash_password, verify_and_rehash_password
 from app.auth.dependencies import get_current_active_user
+from app.core.config import get_settings
+from app.core.ratelimit import ConcurrencyLimit, RateLimiter, client_ip
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 
 router = APIRouter()
+settings = get_settings()
+
+# Every login attempt costs a bcrypt verification
+login_ip_limit = RateLimiter("login_ip", settings.LOGIN_RATE_LIMIT_PER_IP)
+login_account_limit = RateLimiter("login_account", settings.LOGIN_RATE_LIMIT_PER_ACCOUNT)
+login_admission = ConcurrencyLimit("login", settings.LOGIN_MAX_IN_FLIGHT)
+
+async def limit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    await login_ip_limit.check(client_ip(request))
+    # Per account too, so guessing one password from many addresses is slowed as well
+    await login_account_limit.check(form_data.username.lower())
 
 # Schemas
 class Token(BaseModel):
@@ -45,7 +58,7 @@ async def register(user_in: UserCreate):
     
     user = User(
         email=user_in.email,
-        password_hash=get_password_hash(user_in.password),
+        password_hash=await hash_password(user_in.password),
         full_name=user_in.full_name,
         # is_active=False # Uncomment if implementing email verification flow
     )
@@ -62,16 +75,23 @@ async def register(user_in: UserCreate):
         is_active=user.is_active
     )
 
-@router.post("/token", response_model=Token)
+@router.post("/token", response_model=Token, dependencies=[Depends(limit_login), Depends(login_admission)])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await User.find_one(User.email == form_data.username)
-    if not user or not verify_password(form_data.password, user.password_hash):
+    is_valid, new_hash = False, None
+    if user:
+        is_valid, new_hash = await verify_and_rehash_password(form_data.password, user.password_hash)
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade hashes made with an outdated bcrypt cost
+    if new_hash:
+        user.password_hash = new_hash
+
     # Update last login
     user.last_login = datetime.utcnow()
     await user.save()
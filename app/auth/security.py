@@ -1,13 +1,77 @@
+import asyncio
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import get_settings
+from app.core.metrics import register_collector
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with a different cost are reported by needs_update() and
+# upgraded on the user's next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+class PasswordHasherPool:
+    """
+    Runs bcrypt on a fixed set of threads so hashing never blocks the event
+    loop (bcrypt releases the GIL). Calls beyond `max_workers` wait in the
+    executor queue; the queue depth is reported through /stats.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.queue_wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn, *args):
+        submitted_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            result = fn(*args)
+            return result, started_at, time.perf_counter()
+
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, finished_at = await loop.run_in_executor(self._executor, timed)
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        self.queue_wait_seconds += started_at - submitted_at
+        self.run_seconds += finished_at - started_at
+        return result
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.run_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+password_hasher = PasswordHasherPool(max_workers=settings.PASSWORD_HASH_WORKERS)
+register_collector("password_hasher", password_hasher.stats)
 
 def _hash_password_pre(password: str) -> str:
     # Pre-hash password with SHA256 to ensure it fits within bcrypt's 72-byte limit
@@ -20,6 +84,20 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(_hash_password_pre(password))
 
+async def hash_password(password: str) -> str:
+    """get_password_hash, run on the password hasher pool."""
+    return await password_hasher.run(get_password_hash, password)
+
+async def verify_and_rehash_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify on the password hasher pool. When the password is valid but the
+    stored hash is outdated (e.g. BCRYPT_ROUNDS changed), also returns a
+    replacement hash to store.
+    """
+    return await password_hasher.run(
+        pwd_context.verify_and_update, _hash_password_pre(plain_password), hashed_password
+    )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
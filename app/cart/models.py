@@ -1,5 +1,6 @@
 from beanie import Document, Indexed, PydanticObjectId
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 from datetime import datetime
 from typing import List, Optional
 
@@ -7,16 +8,16 @@ class CartItem(BaseModel):
     product_id: PydanticObjectId
     variant_sku: str
     quantity: int = Field(..., gt=0)
-    added_at: datetime = datetime.utcnow()
+    added_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Cart(Document):
     user_id: Indexed(PydanticObjectId, unique=True)
     items: List[CartItem] = []
-    updated_at: datetime = datetime.utcnow()
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
         name = "carts"
         indexes = [
-            # TTL index for automatic expiration after 7 days (604800 seconds)
-            [("updated_at", 1), ("expireAfterSeconds", 604800)]
+            # Carts untouched for 7 days expire
+            IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=7 * 24 * 3600),
         ]
@@ -2,8 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from app.cart.models import Cart, CartItem
 from app.auth.dependencies import get_current_active_user, User
 from app.product.models import Product
-from pydantic import BaseModel
+from app.product.pricing import get_pricing_snapshots
+from app.product.skus import find_variant
+from pydantic import BaseModel, Field
 from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from typing import List, Optional
 from decimal import Decimal
@@ -13,7 +18,10 @@ router = APIRouter()
 class AddToCartRequest(BaseModel):
     product_id: str
     variant_sku: str
-    quantity: int
+    quantity: int = Field(..., gt=0)
+
+class SetCartRequest(BaseModel):
+    items: List[AddToCartRequest]
 
 class CartItemDetail(BaseModel):
     product_id: str
@@ -41,34 +49,28 @@ async def get_cart_with_details(cart: Cart) -> CartDetailResponse:
             total_price=0.0
         )
 
-    product_ids = list(set([item.product_id for item in cart.items]))
-    products = await Product.find({"_id": {"$in": product_ids}}).to_list()
-    product_map = {p.id: p for p in products}
+    snapshots = await get_pricing_snapshots(item.product_id for item in cart.items)
 
     detailed_items = []
     total_cart_price = Decimal("0.00")
 
     for item in cart.items:
-        product = product_map.get(item.product_id)
-        if not product:
-            continue 
+        snapshot = snapshots.get(item.product_id)
+        if not snapshot:
+            continue
 
-        variant = next((v for v in product.variants if v.sku == item.variant_sku), None)
-        price_adj = variant.price_adjustment if variant else Decimal("0.00")
-        final_price = product.base_price + price_adj
-        
-        image = product.images[0] if product.images else None
+        final_price = snapshot.price_for(item.variant_sku)
 
         detailed_items.append(CartItemDetail(
             product_id=str(item.product_id),
             variant_sku=item.variant_sku,
             quantity=item.quantity,
             added_at=item.added_at,
-            title=product.title,
+            title=snapshot.title,
             price=float(final_price),
-            image=image
+            image=snapshot.image
         ))
-        
+
         total_cart_price += final_price * item.quantity
 
     return CartDetailResponse(
@@ -79,59 +81,132 @@ async def get_cart_with_details(cart: Cart) -> CartDetailResponse:
         total_price=float(total_cart_price)
     )
 
+def _parse_product_id(product_id: str) -> PydanticObjectId:
+    try:
+        return PydanticObjectId(product_id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid product ID format")
+
+# Cart writes below are single atomic operators applied server-side, so
+# concurrent requests (e.g. two tabs) can't overwrite each other's changes.
+
 @router.get("/", response_model=CartDetailResponse)
 async def get_cart(user: User = Depends(get_current_active_user)):
-    cart = await Cart.find_one(Cart.user_id == user.id)
-    if not cart:
-        cart = Cart(user_id=user.id)
-        await cart.insert()
-    return await get_cart_with_details(cart)
+    raw = await Cart.get_motor_collection().find_one_and_update(
+        {"user_id": user.id},
+        {"$setOnInsert": {"items": [], "updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return await get_cart_with_details(Cart.model_validate(raw))
 
 @router.post("/items", response_model=CartDetailResponse)
 async def add_item_to_cart(
     item_in: AddToCartRequest,
     user: User = Depends(get_current_active_user)
 ):
-    try:
-        product_id = PydanticObjectId(item_in.product_id)
-    except:
-        raise HTTPException(status_code=400, detail="Invalid product ID format")
-
-    product = await Product.get(product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    product_id = _parse_product_id(item_in.product_id)
 
-    variant = next((v for v in product.variants if v.sku == item_in.variant_sku), None)
-    if not variant:
+    # Only the requested variant is read, not the whole product
+    found = await find_variant(item_in.variant_sku, product_id=product_id)
+    if not found:
+        if not await Product.find(Product.id == product_id).count():
+            raise HTTPException(status_code=404, detail="Product not found")
         raise HTTPException(status_code=404, detail="Variant not found")
+    _, variant = found
     
     if variant.stock_quantity < item_in.quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
 
-    cart = await Cart.find_one(Cart.user_id == user.id)
-    if not cart:
-        cart = Cart(user_id=user.id)
-    
-    existing_item = next(
-        (i for i in cart.items if i.product_id == product_id and i.variant_sku == item_in.variant_sku),
-        None
-    )
-
-    if existing_item:
-        existing_item.quantity += item_in.quantity
-        if existing_item.quantity > variant.stock_quantity:
-             raise HTTPException(status_code=400, detail="Total quantity exceeds stock")
-    else:
-        new_item = CartItem(
-            product_id=product_id,
-            variant_sku=item_in.variant_sku,
-            quantity=item_in.quantity
+    collection = Cart.get_motor_collection()
+    now = datetime.utcnow()
+    line = {"product_id": product_id, "variant_sku": item_in.variant_sku}
+
+    for _ in range(2):
+        # Existing line: $inc in place, only while the new total fits in stock
+        raw = await collection.find_one_and_update(
+            {
+                "user_id": user.id,
+                "items": {"$elemMatch": {**line, "quantity": {"$lte": variant.stock_quantity - item_in.quantity}}},
+            },
+            {"$inc": {"items.$.quantity": item_in.quantity}, "$set": {"updated_at": now}},
+            return_document=ReturnDocument.AFTER,
         )
-        cart.items.append(new_item)
-    
-    cart.updated_at = datetime.utcnow()
-    await cart.save()
-    return await get_cart_with_details(cart)
+        if raw:
+            break
+
+        # New line: $push, creating the cart if the user has none yet
+        try:
+            raw = await collection.find_one_and_update(
+                {"user_id": user.id, "items": {"$not": {"$elemMatch": line}}},
+                {
+                    "$push": {"items": {**line, "quantity": item_in.quantity, "added_at": now}},
+                    "$set": {"updated_at": now},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            break
+        except DuplicateKeyError:
+            # The cart exists and already has this line, so the $inc above
+            # was refused for stock, unless a concurrent request created the
+            # line in between; one more round tells the two apart.
+            raw = None
+
+    if not raw:
+        raise HTTPException(status_code=400, detail="Total quantity exceeds stock")
+    return await get_cart_with_details(Cart.model_validate(raw))
+
+@router.put("/items", response_model=CartDetailResponse)
+async def set_cart_items(
+    cart_in: SetCartRequest,
+    user: User = Depends(get_current_active_user)
+):
+    """Replace the whole cart in one call, e.g. when syncing a client-side cart."""
+    quantities = {}
+    for item in cart_in.items:
+        key = (_parse_product_id(item.product_id), item.variant_sku)
+        quantities[key] = quantities.get(key, 0) + item.quantity
+
+    product_ids = list({product_id for product_id, _ in quantities})
+    products = await Product.find(In(Product.id, product_ids)).to_list()
+    product_map = {p.id: p for p in products}
+
+    for (product_id, sku), quantity in quantities.items():
+        product = product_map.get(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        variant = product.variant(sku)
+        if not variant:
+            raise HTTPException(status_code=404, detail=f"Variant {sku} not found")
+        if variant.stock_quantity < quantity:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock for {sku}")
+
+    # Lines that were already in the cart keep their original added_at
+    collection = Cart.get_motor_collection()
+    current = await collection.find_one({"user_id": user.id}, {"items": 1})
+    added_at = {
+        (i["product_id"], i["variant_sku"]): i["added_at"]
+        for i in (current or {}).get("items", [])
+    }
+    now = datetime.utcnow()
+    items = [
+        {
+            "product_id": product_id,
+            "variant_sku": sku,
+            "quantity": quantity,
+            "added_at": added_at.get((product_id, sku), now),
+        }
+        for (product_id, sku), quantity in quantities.items()
+    ]
+
+    raw = await collection.find_one_and_update(
+        {"user_id": user.id},
+        {"$set": {"items": items, "updated_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return await get_cart_with_details(Cart.model_validate(raw))
 
 @router.delete("/items/{product_id}/{variant_sku}", response_model=CartDetailResponse)
 async def remove_item_from_cart(
@@ -139,20 +214,19 @@ async def remove_item_from_cart(
     variant_sku: str,
     user: User = Depends(get_current_active_user)
 ):
-    cart = await Cart.find_one(Cart.user_id == user.id)
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    
     try:
         pid = PydanticObjectId(product_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid product ID")
 
-    cart.items = [
-        item for item in cart.items 
-        if not (item.product_id == pid and item.variant_sku == variant_sku)
-    ]
-    
-    cart.updated_at = datetime.utcnow()
-    await cart.save()
-    return await get_cart_with_details(cart)
+    raw = await Cart.get_motor_collection().find_one_and_update(
+        {"user_id": user.id},
+        {
+            "$pull": {"items": {"product_id": pid, "variant_sku": variant_sku}},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if not raw:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    return await get_cart_with_details(Cart.model_validate(raw))
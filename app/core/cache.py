@@ -0,0 +1,101 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.core.metrics import register_collector
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry expiry and LRU eviction.
+
+    Not shared between workers: every process keeps its own copy, so the TTL
+    is the upper bound on staleness for writes made by another process.
+
+    `generation` is bumped on every invalidation. Read-through callers capture
+    it before querying the database and pass it back to `set`, so a result
+    loaded before a concurrent write is never stored after that write.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.generation = 0
+        register_collector(f"cache_{name}", self.stats)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self.generation += 1
+        if self._entries.pop(key, _MISSING) is not _MISSING:
+            self.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> None:
+        self.generation += 1
+        stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from fastapi import Request, Response
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires (RFC 9110 13.1.2)
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def not_modified(request: Request, response: Response, etag: str, cache_control: str = "public, no-cache") -> Optional[Response]:
+    """
+    Put `etag` on the response; if the client already has it, return the 304
+    to send instead.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
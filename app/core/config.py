@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str
@@ -11,6 +12,111 @@ class Settings(BaseSettings):
     STRIPE_SECRET_KEY: str
     STRIPE_PUBLISHABLE_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+
+    # Create/check indexes when a worker starts. Set to false in production
+    # and run `python migrate.py` on deploy instead.
+    STARTUP_CREATE_INDEXES: bool = True
+
+    # MongoDB client. Unset values fall back to the URI, then to the driver
+    # defaults (pool of 100, no minimum, no compression)
+    MONGO_MAX_POOL_SIZE: Optional[int] = None
+    # Connections opened at startup and kept open while idle
+    MONGO_MIN_POOL_SIZE: Optional[int] = None
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_CONNECT_TIMEOUT_MS: Optional[int] = None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: Optional[int] = None
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    # Wire compression in order of preference, e.g. "zstd,zlib"
+    # (zstd needs the zstandard package, snappy python-snappy)
+    MONGO_COMPRESSORS: Optional[str] = None
+    MONGO_ZLIB_COMPRESSION_LEVEL: Optional[int] = None
+    # Where storefront catalog reads (listing, detail, facets) go. Checkout,
+    # carts and admin writes always use the primary.
+    MONGO_CATALOG_READ_PREFERENCE: Literal[
+        "primary", "primaryPreferred", "secondaryPreferred", "secondary", "nearest"
+    ] = "primary"
+    # Skip secondaries lagging more than this (at least 90, per MongoDB)
+    MONGO_CATALOG_MAX_STALENESS_SECONDS: Optional[int] = None
+
+    # If set, GET /metrics requires "Authorization: Bearer <token>"
+    METRICS_BEARER_TOKEN: Optional[str] = None
+
+    # "stripe", or "fake" for tests and benchmarks
+    PAYMENT_GATEWAY: str = "stripe"
+    STRIPE_TIMEOUT_SECONDS: float = 10.0
+    STRIPE_MAX_NETWORK_RETRIES: int = 2
+    STRIPE_MAX_WORKERS: int = 8
+    FAKE_PAYMENT_LATENCY_SECONDS: float = 0.0
+    # Retry attaching payment intents to orders whose checkout couldn't
+    PAYMENT_OUTBOX_INTERVAL_SECONDS: int = 15
+    PAYMENT_OUTBOX_GRACE_SECONDS: int = 30
+    PAYMENT_OUTBOX_BATCH_SIZE: int = 50
+    # Background consumer for persisted webhook events
+    PAYMENT_EVENT_POLL_SECONDS: float = 2.0
+    PAYMENT_EVENT_BATCH_SIZE: int = 100
+    PAYMENT_EVENT_MAX_ATTEMPTS: int = 5
+    # Unpaid PENDING orders release their stock after this long
+    ORDER_RESERVATION_HOLD_MINUTES: int = 30
+    RESERVATION_SWEEP_INTERVAL_SECONDS: int = 60
+    RESERVATION_SWEEP_BATCH_SIZE: int = 100
+    # Sales rollups are updated right after payment events change orders;
+    # the interval only matters as a fallback
+    SALES_ROLLUP_INTERVAL_SECONDS: int = 60
+    SALES_ROLLUP_BATCH_SIZE: int = 100
+
+    # In-process catalog cache (per worker)
+    PRODUCT_CACHE_TTL_SECONDS: int = 60
+    PRODUCT_CACHE_MAX_ENTRIES: int = 1024
+    # How often each worker checks the shared catalog version (ETags, and
+    # dropping its caches after another worker's product write)
+    CATALOG_VERSION_POLL_SECONDS: float = 2.0
+    # Price/title snapshots used to render carts; kept short since they are
+    # read on every cart request
+    PRODUCT_PRICING_CACHE_TTL_SECONDS: int = 10
+    PRODUCT_PRICING_CACHE_MAX_ENTRIES: int = 10000
+    SKU_CACHE_MAX_ENTRIES: int = 50000
+    # NDJSON catalog import/export (app.product.bulk)
+    PRODUCT_IMPORT_BATCH_SIZE: int = 500
+    PRODUCT_IMPORT_MAX_LINE_BYTES: int = 1024 * 1024
+    PRODUCT_EXPORT_BATCH_SIZE: int = 500
+
+    # Authenticated principal cache (per worker). Role/deactivation changes
+    # reach other workers within PRINCIPAL_REVOCATION_POLL_SECONDS.
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_REVOCATION_POLL_SECONDS: int = 5
+
+    # Product image uploads
+    UPLOAD_MAX_BYTES: int = 5 * 1024 * 1024
+    # max-age for static files without a content hash in their name;
+    # hashed uploads are cached for a year
+    STATIC_MAX_AGE_SECONDS: int = 300
+    # Processes resizing uploads into renditions, and how many uploads may
+    # wait for one before further uploads queue in the request
+    IMAGE_WORKERS: int = 2
+    IMAGE_MAX_PENDING: int = 16
+
+    # Token-bucket limits for login and checkout, as "<burst>/<second|minute|hour>"
+    # (refilled evenly over the period); empty disables a limit. "memory"
+    # buckets are per worker, "mongo" ones are shared by all workers.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["memory", "mongo"] = "memory"
+    RATE_LIMIT_MAX_BUCKETS: int = 100000
+    LOGIN_RATE_LIMIT_PER_IP: str = "20/minute"
+    LOGIN_RATE_LIMIT_PER_ACCOUNT: str = "10/minute"
+    CHECKOUT_RATE_LIMIT_PER_IP: str = "30/minute"
+    CHECKOUT_RATE_LIMIT_PER_USER: str = "10/minute"
+    # Requests per worker running login/checkout at once; more get 503.
+    # 0 disables the cap.
+    LOGIN_MAX_IN_FLIGHT: int = 32
+    CHECKOUT_MAX_IN_FLIGHT: int = 64
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # bcrypt cost factor; existing hashes are upgraded on next login
+    BCRYPT_ROUNDS: int = 12
+    # Threads reserved for bcrypt, so hashing never runs on the event loop
+    PASSWORD_HASH_WORKERS: int = 4
     
     class Config:
         env_file = ".env"
@@ -1,27 +1,141 @@
+import asyncio
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Primary, PrimaryPreferred, SecondaryPreferred, Secondary, Nearest
 from beanie import init_beanie
+from beanie.odm.utils.init import Initializer
 from app.core.config import get_settings
+from app.core.instrumentation import mongo_event_listeners
 
 from app.auth.models import User
 from app.product.models import Product
 from app.cart.models import Cart
 from app.order.models import Order
+from app.payment.models import PaymentEvent
+from app.core.versions import VersionStamp
+from app.analytics.models import SalesRollup
+from app.core.ratelimit import RateLimitBucket
 
-async def init_db():
+DOCUMENT_MODELS = [
+    User,
+    Product,
+    Cart,
+    Order,
+    PaymentEvent,
+    VersionStamp,
+    SalesRollup,
+    RateLimitBucket,
+]
+
+_client: Optional[AsyncIOMotorClient] = None
+
+def get_motor_client() -> AsyncIOMotorClient:
+    # The client the document models were initialised with (needed for sessions/transactions)
+    if _client is not None:
+        return _client
+    # Tests and benchmarks call init_beanie themselves
+    return User.get_motor_collection().database.client
+
+def mongo_client_options() -> dict:
     settings = get_settings()
-    client = AsyncIOMotorClient(settings.MONGO_URI)
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "compressors": settings.MONGO_COMPRESSORS,
+        "zlibCompressionLevel": settings.MONGO_ZLIB_COMPRESSION_LEVEL,
+    }
+    # Only what's configured, so options in MONGO_URI still apply otherwise
+    options = {name: value for name, value in options.items() if value is not None}
+    options["appname"] = settings.PROJECT_NAME
+    # Command and pool timings for /metrics
+    options["event_listeners"] = mongo_event_listeners()
+    return options
+
+_READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondaryPreferred": SecondaryPreferred,
+    "secondary": Secondary,
+    "nearest": Nearest,
+}
+
+def catalog_read_preference():
+    settings = get_settings()
+    if settings.MONGO_CATALOG_READ_PREFERENCE == "primary":
+        return Primary()
+    return _READ_PREFERENCES[settings.MONGO_CATALOG_READ_PREFERENCE](
+        max_staleness=settings.MONGO_CATALOG_MAX_STALENESS_SECONDS or -1
+    )
+
+_catalog_collections = {}
+
+def catalog_collection(model):
+    """
+    `model`'s collection with the catalog read preference, for storefront
+    reads that tolerate replication lag. Anything read-then-written (stock,
+    carts, orders) must use the model's own collection instead.
+    """
+    collection = model.get_motor_collection()
+    cached = _catalog_collections.get(model)
+    # Re-derived if the models were initialised again (tests, benchmarks)
+    if cached is None or cached[0] is not collection:
+        cached = (collection, collection.with_options(read_preference=catalog_read_preference()))
+        _catalog_collections[model] = cached
+    return cached[1]
+
+class _AttachOnlyInitializer(Initializer):
+    """init_beanie without the per-collection index checks and builds."""
+
+    async def init_indexes(self, cls, allow_index_dropping: bool = False):
+        # Indexes are managed by `python migrate.py` (see app.core.migrations)
+        return None
+
+async def init_db(create_indexes: Optional[bool] = None):
+    global _client
+    settings = get_settings()
+    if create_indexes is None:
+        create_indexes = settings.STARTUP_CREATE_INDEXES
+    client = AsyncIOMotorClient(settings.MONGO_URI, **mongo_client_options())
+    _client = client
     
     # We will pass the specific database name from the URI or config
     # Beanie requires the database object, not just client
     database = client.get_default_database()
     
-    # We will register models later when they are created
-    await init_beanie(
-        database=database,
-        document_models=[
-            User,
-            Product,
-            Cart,
-            Order
-        ]
-    )
+    if create_indexes:
+        await init_beanie(
+            database=database,
+            document_models=DOCUMENT_MODELS
+        )
+    else:
+        # Production: only attach the models; many workers booting at once
+        # would otherwise each ask the primary about every index
+        await _AttachOnlyInitializer(database=database, document_models=DOCUMENT_MODELS)
+
+async def warm_up_db() -> None:
+    """
+    Open MONGO_MIN_POOL_SIZE connections now instead of on the first
+    requests, to the primary and to the servers catalog reads go to.
+    """
+    settings = get_settings()
+    client = get_motor_client()
+    count = max(1, settings.MONGO_MIN_POOL_SIZE or 0)
+    read_preferences = [Primary()]
+    if settings.MONGO_CATALOG_READ_PREFERENCE != "primary":
+        read_preferences.append(catalog_read_preference())
+    # Concurrent pings each need a connection of their own
+    await asyncio.gather(*(
+        client.admin.command("ping", read_preference=read_preference)
+        for read_preference in read_preferences
+        for _ in range(count)
+    ))
+
+def close_db() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
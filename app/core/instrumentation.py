@@ -0,0 +1,127 @@
+import threading
+import time
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import Counter, Histogram
+
+# Request and MongoDB timings for /metrics. Labels are route templates and
+# collection names, never raw paths or ids, so the number of series stays
+# bounded.
+
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", ("method", "route")
+)
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips", ("command", "collection"), MONGO_BUCKETS
+)
+mongo_command_failures = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error", ("command", "collection")
+)
+mongo_checkout_wait = Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", (), MONGO_BUCKETS
+)
+mongo_checkout_failures = Counter(
+    "mongodb_pool_checkout_failures_total", "Connection checkouts that failed", ("reason",)
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+def route_label(scope: Scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        # FastAPI's APIRoute, with the router prefix: /products/{slug}
+        return route.path
+    if "endpoint" in scope:
+        # Mounted app, e.g. static files
+        return scope.get("root_path", "") + "/{path}"
+    return UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """Counts requests and times them per (method, route template, status)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started_at = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router filled in the matched route on the way in
+            route = route_label(scope)
+            http_request_duration.observe(time.perf_counter() - started_at, (scope["method"], route))
+            http_requests.inc((scope["method"], route, status))
+
+class CommandTimer(monitoring.CommandListener):
+    """Per-command latency from pymongo's command monitoring events."""
+
+    def __init__(self):
+        # (connection, request id) -> collection, between started and succeeded/failed
+        self._collections = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        # {"find": "products", ...}; getMore names its collection separately
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(event.duration_micros / 1e6, (event.command_name, collection))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(event.duration_micros / 1e6, (event.command_name, collection))
+        mongo_command_failures.inc((event.command_name, collection))
+
+class PoolCheckoutTimer(monitoring.ConnectionPoolListener):
+    """
+    Time from asking the pool for a connection to getting one. pymongo 4.6
+    events carry no duration; a checkout starts and ends on the same thread,
+    so the start time is kept in a thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started_at = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        started_at = getattr(self._local, "started_at", None)
+        if started_at is not None:
+            mongo_checkout_wait.observe(time.perf_counter() - started_at)
+            self._local.started_at = None
+
+    def connection_check_out_failed(self, event) -> None:
+        self._local.started_at = None
+        mongo_checkout_failures.inc((event.reason,))
+
+    # The rest of the pool lifecycle isn't measured
+    def pool_created(self, event) -> None: pass
+    def pool_ready(self, event) -> None: pass
+    def pool_cleared(self, event) -> None: pass
+    def pool_closed(self, event) -> None: pass
+    def connection_created(self, event) -> None: pass
+    def connection_ready(self, event) -> None: pass
+    def connection_closed(self, event) -> None: pass
+    def connection_checked_in(self, event) -> None: pass
+
+def mongo_event_listeners() -> list:
+    return [CommandTimer(), PoolCheckoutTimer()]
@@ -0,0 +1,113 @@
+import re
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Components (caches, worker pools, background tasks) register a callable that
+# returns a flat dict of numbers describing their current state.
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    _collectors[name] = collector
+
+def collect_stats() -> Dict[str, dict]:
+    return {name: collector() for name, collector in _collectors.items()}
+
+# Counters and histograms for /metrics (Prometheus text format). Recording is
+# a lock plus a couple of list updates; all formatting happens at scrape
+# time. The lock matters because pymongo listeners run on Motor's threads.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: List["Metric"] = []
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _labels(self, values: Tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.label_names, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help, label_names)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return super().render() + [f"{self.name}{self._labels(labels)} {_number(value)}" for labels, value in values]
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last one is +Inf)..., sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, labels: Tuple = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = super().render()
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = 'le="%s"' % (bound if bound == "+Inf" else _number(bound))
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+def render_prometheus(prefix: str = "shop") -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    # Collector stats become gauges, e.g. shop_cache_product_detail_hits
+    for component, stats in collect_stats().items():
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+            name = _INVALID_NAME_CHARS.sub("_", f"{prefix}_{component}_{key}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,81 @@
+from typing import Dict, List, NamedTuple
+
+from beanie.odm.settings.document import IndexModelField
+from beanie.odm.utils.pydantic import get_model_fields
+from beanie.odm.utils.typing import get_index_attributes
+from pymongo import IndexModel
+
+# Index management for `python migrate.py`. Workers started with
+# STARTUP_CREATE_INDEXES=false never touch indexes, so this is where they
+# get created, changed and cleaned up.
+
+# Indexes earlier versions created that no model declares any more
+OBSOLETE_INDEXES: Dict[str, List[str]] = {
+    # The cart TTL was declared as a compound key on ("updated_at",
+    # "expireAfterSeconds"), so carts never expired
+    "carts": ["updated_at_1_expireAfterSeconds_604800"],
+}
+
+class IndexPlan(NamedTuple):
+    collection: str
+    missing: List[str]
+    # Declared differently from what the server has (options or name)
+    changed: List[str]
+    obsolete: List[str]
+    # Neither declared nor known obsolete, e.g. created by hand
+    unknown: List[str]
+
+    @property
+    def up_to_date(self) -> bool:
+        return not (self.missing or self.changed or self.obsolete)
+
+def declared_indexes(model) -> List[IndexModelField]:
+    """What init_beanie would create for `model`: Indexed() fields plus Settings.indexes."""
+    found = []
+    for name, field in get_model_fields(model).items():
+        attributes = get_index_attributes(field)
+        if attributes is not None:
+            found.append(IndexModelField(IndexModel([(field.alias or name, attributes[0])], **attributes[1])))
+    return IndexModelField.merge_indexes(found, model.get_settings().indexes or [])
+
+async def plan_indexes(model):
+    collection = model.get_motor_collection()
+    existing = IndexModelField.from_motor_index_information(await collection.index_information())
+    declared = declared_indexes(model)
+    obsolete_names = OBSOLETE_INDEXES.get(collection.name, [])
+
+    missing, changed, replaced = [], [], []
+    for index in declared:
+        if index in existing:
+            continue
+        # Same name or same keys: has to be dropped before it can be created
+        conflict = next((e for e in existing if e.name == index.name or e.same_fields(index)), None)
+        if conflict is None:
+            missing.append(index)
+        else:
+            changed.append(index)
+            replaced.append(conflict)
+
+    accounted = {index.name for index in declared} | {index.name for index in replaced}
+    obsolete = [e for e in existing if e.name in obsolete_names and e.name not in accounted]
+    unknown = [e for e in existing if e.name not in accounted and e.name not in obsolete_names]
+    plan = IndexPlan(
+        collection=collection.name,
+        missing=[index.name for index in missing],
+        changed=[index.name for index in changed],
+        obsolete=[index.name for index in obsolete],
+        unknown=[index.name for index in unknown],
+    )
+    return plan, missing + changed, replaced + obsolete, unknown
+
+async def migrate_indexes(model, drop_unknown: bool = False) -> IndexPlan:
+    """Bring `model`'s indexes in line with its declaration; returns what was done."""
+    plan, to_create, to_drop, unknown = await plan_indexes(model)
+    collection = model.get_motor_collection()
+    if drop_unknown:
+        to_drop = to_drop + unknown
+    for index in to_drop:
+        await collection.drop_index(index.name)
+    if to_create:
+        await collection.create_indexes(IndexModelField.list_to_index_model(to_create))
+    return plan
@@ -0,0 +1,31 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from beanie import PydanticObjectId
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, object_id: PydanticObjectId) -> str:
+    """Opaque cursor pointing just past (created_at, _id) in a newest-first listing."""
+    raw = json.dumps({"c": created_at.isoformat(), "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, PydanticObjectId]:
+    """Inverse of encode_cursor. Raises ValueError for anything it did not produce."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["c"]), PydanticObjectId(data["i"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def keyset_after(created_at: datetime, object_id: PydanticObjectId) -> dict:
+    """Filter for documents strictly after the cursor in (created_at desc, _id desc) order."""
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": object_id}},
+        ]
+    }
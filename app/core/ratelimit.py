@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from beanie import Document
+from fastapi import HTTPException, Request, status
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import Counter, register_collector
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+rate_limit_decisions = Counter(
+    "rate_limit_decisions_total", "Rate limiter decisions by limit and outcome", ("limit", "decision")
+)
+admission_decisions = Counter(
+    "admission_decisions_total", "Concurrency cap decisions by endpoint and outcome", ("endpoint", "decision")
+)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+class RateLimit(NamedTuple):
+    """A token bucket: bursts of up to `capacity`, refilled evenly at `per_second`."""
+    capacity: int
+    per_second: float
+
+def parse_rate(value: str) -> Optional[RateLimit]:
+    """"10/minute" -> RateLimit(10, 1/6). Empty or "0/..." means no limit."""
+    if not value:
+        return None
+    count, _, period = value.partition("/")
+    if period not in PERIODS:
+        raise ValueError(f"Invalid rate {value!r}, expected e.g. '10/minute'")
+    if int(count) <= 0:
+        return None
+    return RateLimit(int(count), int(count) / PERIODS[period])
+
+class Decision(NamedTuple):
+    allowed: bool
+    # Seconds until the next token; 0 when allowed
+    retry_after: float
+
+def take_token(tokens: float, elapsed: float, limit: RateLimit):
+    """Refill for `elapsed` seconds, then take one token if there is one. Returns (decision, tokens left)."""
+    tokens = min(limit.capacity, tokens + elapsed * limit.per_second)
+    if tokens >= 1:
+        return Decision(True, 0.0), tokens - 1
+    return Decision(False, (1 - tokens) / limit.per_second), tokens
+
+class MemoryBuckets:
+    """
+    Buckets in this worker only, so the effective limit is the configured one
+    times the number of workers. A bucket is dropped once it would be full
+    again; evicting one early only errs towards allowing.
+    """
+
+    def __init__(self, max_entries: int):
+        self._buckets = TTLCache("rate_limit_buckets", ttl_seconds=0, max_entries=max_entries)
+
+    async def take(self, key: str, limit: RateLimit) -> Decision:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key) or (limit.capacity, now)
+        decision, tokens = take_token(tokens, now - updated_at, limit)
+        self._buckets.set(key, (tokens, now), ttl_seconds=(limit.capacity - tokens) / limit.per_second)
+        return decision
+
+class RateLimitBucket(Document):
+    id: str
+    tokens: float
+    updated_at: datetime
+    allowed: bool
+    # When the bucket would be full again; it is deleted then
+    expires_at: datetime
+
+    class Settings:
+        name = "rate_limits"
+        indexes = [
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ]
+
+class MongoBuckets:
+    """
+    Buckets shared by every worker. One round trip per decision: the refill
+    and take happen in a single pipeline update, timed by the server clock
+    ($$NOW) so worker clock skew doesn't matter.
+    """
+
+    async def take(self, key: str, limit: RateLimit) -> Decision:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [limit.capacity, {"$add": [
+            {"$ifNull": ["$tokens", limit.capacity]}, {"$multiply": [elapsed, limit.per_second]},
+        ]}]}
+        has_token = {"$gte": ["$tokens", 1]}
+        doc = await RateLimitBucket.get_motor_collection().find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+                {"$set": {"allowed": has_token, "tokens": {"$cond": [has_token, {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+                {"$set": {"expires_at": {"$add": [
+                    "$$NOW", {"$multiply": [{"$subtract": [limit.capacity, "$tokens"]}, 1000 / limit.per_second]},
+                ]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["allowed"]:
+            return Decision(True, 0.0)
+        return Decision(False, (1 - doc["tokens"]) / limit.per_second)
+
+@lru_cache()
+def get_bucket_store():
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        return MongoBuckets()
+    return MemoryBuckets(max_entries=settings.RATE_LIMIT_MAX_BUCKETS)
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers/--forwarded-allow-ips
+    # so this is the client's address rather than the proxy's
+    return request.client.host if request.client else ""
+
+class RateLimiter:
+    def __init__(self, name: str, rate: str):
+        self.name = name
+        self.limit = parse_rate(rate)
+
+    async def check(self, key: Optional[str]) -> None:
+        """Take a token for `key` or raise 429. Fails open if the backend is down."""
+        if self.limit is None or not key or not settings.RATE_LIMIT_ENABLED:
+            return
+        # Hashed so emails and addresses don't end up in the rate_limits collection
+        bucket = f"{self.name}:{hashlib.sha256(key.encode()).hexdigest()[:32]}"
+        try:
+            decision = await get_bucket_store().take(bucket, self.limit)
+        except Exception:
+            logger.exception(f"Rate limiter {self.name} unavailable, allowing request")
+            rate_limit_decisions.inc((self.name, "error"))
+            return
+
+        if decision.allowed:
+            rate_limit_decisions.inc((self.name, "allowed"))
+            return
+        rate_limit_decisions.inc((self.name, "limited"))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))},
+        )
+
+class ConcurrencyLimit:
+    """
+    Dependency capping how many requests this worker runs an endpoint for at
+    once. Beyond `max_in_flight` requests are turned away with 503 straight
+    away rather than queueing behind work that is already too slow.
+    """
+
+    def __init__(self, name: str, max_in_flight: int):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        register_collector(f"admission_{name}", self.stats)
+
+    async def __call__(self):
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.shed += 1
+            admission_decisions.inc((self.name, "shed"))
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+            )
+
+        self.admitted += 1
+        admission_decisions.inc((self.name, "admitted"))
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
@@ -0,0 +1,22 @@
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+@lru_cache(maxsize=None)
+def _adapter(tp) -> TypeAdapter:
+    return TypeAdapter(tp)
+
+def model_response(tp: Any, value: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """
+    Serialize `value` as `tp` straight to JSON bytes in pydantic-core.
+
+    With `response_model`, FastAPI dumps every returned model to a dict,
+    validates it again and only then encodes it; returning this skips both
+    steps. Keep `response_model` on the route for the OpenAPI schema.
+    Headers set on the injected `response` (ETag, cursors) are carried over.
+    """
+    body = _adapter(tp).dump_json(value, by_alias=True)
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,101 @@
+import os
+import re
+import stat
+from mimetypes import guess_type
+from typing import Optional, Set
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Uploads are named by content hash (see app.product.uploads), so a URL
+# always refers to the same bytes and can be cached forever
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]+)+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Preferred first. A sidecar is the same file precompressed next to it,
+# e.g. app.js.br / app.js.gz
+SIDECARS = (("br", ".br"), ("gzip", ".gz"))
+
+def accepted_encodings(headers: Headers) -> Set[str]:
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def _compressible(path: str) -> bool:
+    # Images are already compressed; don't spend a stat looking for sidecars
+    media_type = guess_type(path)[0] or ""
+    return not media_type.startswith("image/") or media_type == "image/svg+xml"
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with a caching policy: content-hashed files are served as
+    immutable with a strong ETag derived from the name, everything else gets
+    a short max-age and Starlette's mtime/size ETag. If-None-Match is
+    answered with 304, and precompressed .br/.gz sidecars are served to
+    clients that accept them.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD") and _compressible(path):
+            accepted = accepted_encodings(Headers(scope=scope))
+            for encoding, suffix in SIDECARS:
+                if encoding not in accepted:
+                    continue
+                try:
+                    full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                except OSError:
+                    continue
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    return self.file_response(full_path, stat_result, scope, encoding=encoding, original_path=path)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+        encoding: Optional[str] = None,
+        original_path: Optional[str] = None,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        filename = os.path.basename(original_path or full_path)
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            media_type=guess_type(filename)[0] or "text/plain",
+        )
+
+        if HASHED_NAME.match(filename):
+            tag = f"{filename}-{encoding}" if encoding else filename
+            response.headers["etag"] = f'"{tag}"'
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["cache-control"] = f"public, max-age={settings.STATIC_MAX_AGE_SECONDS}"
+
+        if _compressible(filename):
+            response.headers["vary"] = "Accept-Encoding"
+        if encoding:
+            response.headers["content-encoding"] = encoding
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
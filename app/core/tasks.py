@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """
+    Runs `fn` every `interval_seconds` on the event loop until stopped.
+    Started and stopped from the app lifespan; failures are logged and the
+    loop keeps going.
+    """
+
+    def __init__(self, name: str, interval_seconds: float, fn: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.fn = fn
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.runs = 0
+        self.failures = 0
+        self.last_run_seconds = 0.0
+        register_collector(f"task_{name}", self.stats)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=self.name)
+
+    def wake(self) -> None:
+        """Run the next iteration now instead of waiting out the interval."""
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> None:
+        started_at = time.perf_counter()
+        try:
+            await self.fn()
+        except Exception:
+            self.failures += 1
+            logger.exception(f"Periodic task {self.name} failed")
+        finally:
+            self.runs += 1
+            self.last_run_seconds = time.perf_counter() - started_at
+
+    async def _loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            await self.run_once()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "running": int(self._task is not None),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_ms": round(self.last_run_seconds * 1000, 2),
+        }
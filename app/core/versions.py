@@ -0,0 +1,48 @@
+import time
+from beanie import Document
+from pymongo import ReturnDocument
+
+class VersionStamp(Document):
+    """
+    Named counters shared by every worker and CLI process, used to signal
+    "something changed, drop what you cached" across process boundaries.
+    """
+    id: str
+    value: int = 0
+
+    class Settings:
+        name = "version_stamps"
+
+async def bump_version(name: str) -> int:
+    doc = await VersionStamp.get_motor_collection().find_one_and_update(
+        {"_id": name},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["value"]
+
+async def read_version(name: str) -> int:
+    doc = await VersionStamp.get_motor_collection().find_one({"_id": name}, {"value": 1})
+    return doc["value"] if doc else 0
+
+class VersionWatcher:
+    """Caches a version stamp in-process and re-reads it at most every `poll_seconds`."""
+
+    def __init__(self, name: str, poll_seconds: float):
+        self.name = name
+        self.poll_seconds = poll_seconds
+        self._value = 0
+        self._checked_at = float("-inf")
+
+    async def current(self) -> int:
+        now = time.monotonic()
+        if now - self._checked_at >= self.poll_seconds:
+            self._value = await read_version(self.name)
+            self._checked_at = now
+        return self._value
+
+    def observe(self, value: int) -> None:
+        # The local process made the bump itself; no need to wait for the next poll
+        self._value = max(self._value, value)
+        self._checked_at = time.monotonic()
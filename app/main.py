@@ -1,22 +1,51 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Depends, Header, HTTPException
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from app.core.database import init_db
+from typing import Optional
+from app.core.database import init_db, warm_up_db, close_db
 from app.core.config import get_settings
+from app.core.metrics import collect_stats, render_prometheus
+from app.core.instrumentation import MetricsMiddleware
+from app.auth.dependencies import get_current_admin_user
+from app.auth.security import password_hasher
+from app.product.images import image_renderer
+from app.payment.outbox import payment_intent_dispatcher
+from app.payment.gateway import preload_payment_gateway
+from app.payment.consumer import payment_event_consumer
+from app.order.sweeper import reservation_sweeper
+from app.analytics.rollups import sales_rollup_task
 
-from fastapi.staticfiles import StaticFiles
+from app.core.static import CachedStaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.auth.router import router as auth_router
 from app.product.router import router as product_router
 from app.cart.router import router as cart_router
 from app.order.router import router as order_router
 from app.payment.router import router as payment_router
+from app.analytics.router import router as analytics_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    await warm_up_db()
+    # Not awaited: workers take traffic while the Stripe SDK loads
+    gateway_preload = asyncio.create_task(preload_payment_gateway())
+    payment_intent_dispatcher.start()
+    payment_event_consumer.start()
+    reservation_sweeper.start()
+    sales_rollup_task.start()
     yield
     # Shutdown
+    gateway_preload.cancel()
+    await sales_rollup_task.stop()
+    await reservation_sweeper.stop()
+    await payment_event_consumer.stop()
+    await payment_intent_dispatcher.stop()
+    password_hasher.shutdown()
+    image_renderer.shutdown()
+    close_db()
 
 
 import logging
@@ -29,7 +58,10 @@ logging.basicConfig(
 settings = get_settings()
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson for everything that still goes through response_model/dicts;
+    # hot read endpoints bypass that path entirely (app.core.responses)
+    default_response_class=ORJSONResponse,
 )
 
 # CORS Configuration
@@ -46,17 +78,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Runs around the router, so it sees the matched route and the final status
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(product_router, prefix="/products", tags=["Products"])
 app.include_router(cart_router, prefix="/cart", tags=["Cart"])
 app.include_router(order_router, prefix="/orders", tags=["Orders"])
 app.include_router(payment_router, prefix="/stripe", tags=["Payment"])
+app.include_router(analytics_router, prefix="/admin/analytics", tags=["Admin"])
 
 # Mount static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="app/static"), name="static")
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the T-Shirt Store Backend"}
+
+@app.get("/stats", tags=["Admin"])
+async def stats(admin = Depends(get_current_admin_user)):
+    # Runtime counters (cache hit ratios, pool depths, ...) for capacity sizing
+    return collect_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    # Scraped by Prometheus, which can't log in; optionally guarded by a static token
+    if settings.METRICS_BEARER_TOKEN and authorization != f"Bearer {settings.METRICS_BEARER_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
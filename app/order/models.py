@@ -1,5 +1,6 @@
-from beanie import Document, Indexed, PydanticObjectId, DecimalAnnotation
-from pydantic import BaseModel
+from beanie import Document, PydanticObjectId, DecimalAnnotation
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from datetime import datetime
 from enum import Enum
 from typing import List, Optional
@@ -30,15 +31,60 @@ class OrderItem(BaseModel):
     unit_price: DecimalAnnotation
     quantity: int
 
+class RollupState(str, Enum):
+    # Whether the order's revenue is in the sales rollups (app.analytics)
+    COUNTED = "COUNTED"
+    REVERSED = "REVERSED"
+
 class Order(Document):
-    user_id: Indexed(PydanticObjectId)
+    # Covered by the user_created_at_id index below
+    user_id: PydanticObjectId
     status: OrderStatus = OrderStatus.PENDING
     items: List[OrderItem] = []
     total_amount: DecimalAnnotation
     currency: str = "USD"
     shipping_address: ShippingAddress
     payment_intent_id: Optional[str] = None
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    cancelled_at: Optional[datetime] = None
+    paid_at: Optional[datetime] = None
+    refunded_at: Optional[datetime] = None
+    rollup_state: Optional[RollupState] = None
 
     class Settings:
         name = "orders"
+        indexes = [
+            # Background scans for PENDING orders by age (payment outbox, reservation sweeper)
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+            # Sales rollup queue: PAID not yet counted, CANCELLED/REFUNDED not yet reversed
+            IndexModel([("status", ASCENDING), ("rollup_state", ASCENDING)], name="status_rollup_state"),
+            # Refund webhooks identify the order by its payment intent
+            IndexModel(
+                [("payment_intent_id", ASCENDING)],
+                name="payment_intent_id",
+                partialFilterExpression={"payment_intent_id": {"$type": "string"}},
+            ),
+            # Order history: a user's orders newest first, keyset-paginated
+            IndexModel(
+                [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_created_at_id",
+            ),
+        ]
+
+class OrderSummary(BaseModel):
+    """Order history row: what a list needs, without items or address."""
+    id: PydanticObjectId = Field(alias="_id")
+    status: OrderStatus
+    total_amount: DecimalAnnotation
+    currency: str = "USD"
+    item_count: int
+    created_at: datetime
+
+# $project stage producing OrderSummary fields server-side
+ORDER_SUMMARY_PROJECTION = {
+    "status": 1,
+    "total_amount": 1,
+    "currency": 1,
+    "created_at": 1,
+    "item_count": {"$size": {"$ifNull": ["$items", []]}},
+}
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.order.models import Order, OrderItem, ShippingAddress, OrderStatus
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from app.order.models import Order, OrderItem, ShippingAddress, OrderStatus, OrderSummary, ORDER_SUMMARY_PROJECTION
 from app.cart.models import Cart
 from app.product.models import Product
 from app.auth.dependencies import get_current_active_user, User
-from typing import List
+from app.core.config import get_settings
+from app.core.database import get_motor_client
+from app.core.ratelimit import ConcurrencyLimit, RateLimiter, client_ip
+from app.core.responses import model_response
+from app.core.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_after
+from app.payment.gateway import PaymentGatewayError, get_payment_gateway
+from app.payment.outbox import attach_payment_intent
+from beanie import PydanticObjectId
+from typing import List, Optional, Union
 from pydantic import BaseModel
+from beanie.operators import In
+from pymongo import UpdateOne, DESCENDING
 
 from decimal import Decimal
 import logging
@@ -12,29 +22,67 @@ import logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
+settings = get_settings()
 
-class OrderCreate(BaseModel):
-    shipping_address: ShippingAddress
+# Checkout holds a transaction and calls the payment gateway
+checkout_ip_limit = RateLimiter("checkout_ip", settings.CHECKOUT_RATE_LIMIT_PER_IP)
+checkout_user_limit = RateLimiter("checkout_user", settings.CHECKOUT_RATE_LIMIT_PER_USER)
+checkout_admission = ConcurrencyLimit("checkout", settings.CHECKOUT_MAX_IN_FLIGHT)
 
-from app.core.config import get_settings
-import stripe
+async def limit_checkout(request: Request, user: User = Depends(get_current_active_user)):
+    await checkout_ip_limit.check(client_ip(request))
+    await checkout_user_limit.check(str(user.id))
 
-settings = get_settings()
-stripe.api_key = settings.STRIPE_SECRET_KEY
+class OrderCreate(BaseModel):
+    shipping_address: ShippingAddress
 
 class CreateOrderResponse(BaseModel):
     order: Order
+    # None when the payment gateway was unavailable; fetch it later from
+    # GET /orders/{order_id}/payment once the intent has been attached
+    client_secret: Optional[str] = None
+
+class OrderPaymentResponse(BaseModel):
+    order_id: str
+    payment_intent_id: str
     client_secret: str
 
-@router.post("/", response_model=CreateOrderResponse, status_code=status.HTTP_201_CREATED)
+def _insufficient_stock(product: Product, variant) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Insufficient stock for {product.title} ({variant.size.value}/{variant.color}): "
+               f"{variant.stock_quantity} of {variant.sku} available",
+    )
+
+async def _short_variant(requested: dict):
+    """
+    The first (product, variant) with less committed stock than requested.
+    Read outside the checkout transaction: inside it, the decrements that did
+    apply are visible and can't be told apart from the one that didn't.
+    """
+    products = await Product.find(In(Product.id, list({product_id for product_id, _ in requested}))).to_list()
+    product_map = {p.id: p for p in products}
+    for (product_id, sku), quantity in requested.items():
+        product = product_map.get(product_id)
+        variant = product.variant(sku) if product else None
+        if variant is not None and variant.stock_quantity < quantity:
+            return product, variant
+    return None
+
+@router.post(
+    "/",
+    response_model=CreateOrderResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_checkout), Depends(checkout_admission)],
+)
 async def create_order(
     order_in: OrderCreate,
     user: User = Depends(get_current_active_user)
 ):
     # Start Transaction
     # note: Transactions require a MongoDB Replica Set
-    client = Order.get_motor_client()
-    async with client.start_session() as session:
+    client = get_motor_client()
+    async with await client.start_session() as session:
         async with session.start_transaction():
             try:
                 # 1. Fetch Cart
@@ -44,29 +92,28 @@ async def create_order(
 
                 order_items = []
                 total_amount = Decimal("0.00")
-                
-                # 2. Process Items & Reserve Stock
+
+                # 2. Fetch every product in the cart in one round trip
+                product_ids = list({item.product_id for item in cart.items})
+                products = await Product.find(In(Product.id, product_ids), session=session).to_list()
+                product_map = {p.id: p for p in products}
+
+                # Validate against the snapshot and build one conditional
+                # decrement per variant, so failures still name the SKU
+                requested = {}
                 for item in cart.items:
-                    # using config.get_settings().MONGO_URI might be needed if client is lost, but get_motor_client works
-                    product = await Product.get(item.product_id, session=session)
+                    product = product_map.get(item.product_id)
                     if not product:
                         raise HTTPException(status_code=400, detail=f"Product {item.product_id} not found")
                     
-                    variant = next((v for v in product.variants if v.sku == item.variant_sku), None)
+                    variant = product.variant(item.variant_sku)
                     if not variant:
                         raise HTTPException(status_code=400, detail=f"Variant {item.variant_sku} not found")
 
-                    # Atomic Decrement with session
-                    result = await Product.find_one(
-                        Product.id == product.id,
-                        {"variants": {"$elemMatch": {"sku": item.variant_sku, "stock_quantity": {"$gte": item.quantity}}}}
-                    , session=session).update(
-                        {"$inc": {"variants.$.stock_quantity": -item.quantity}},
-                        session=session
-                    )
-
-                    if result.modified_count == 0:
-                        raise HTTPException(status_code=409, detail=f"Insufficient stock for {product.title} ({variant.size}/{variant.color})")
+                    key = (product.id, item.variant_sku)
+                    requested[key] = requested.get(key, 0) + item.quantity
+                    if variant.stock_quantity < requested[key]:
+                        raise _insufficient_stock(product, variant)
                     
                     # Calculate Price
                     # Convert float base_price to Decimal if needed, though model says DecimalAnnotation
@@ -85,49 +132,118 @@ async def create_order(
                         quantity=item.quantity
                     ))
 
-                # 3. Create Stripe Payment Intent (External Call - keep outside transaction risk or handle carefully)
-                # Ideally, we should create the intent *before* committing stock changes permanently or handle failures.
-                # However, since we are in a transaction, if stripe fails, we abort and stock is safe.
-                amount_cents = int(float(total_amount) * 100)
-                
-                try:
-                    intent = stripe.PaymentIntent.create(
-                        amount=amount_cents,
-                        currency="usd",
-                        metadata={"user_id": str(user.id)},
-                        automatic_payment_methods={"enabled": True},
+                # Reserve Stock: all decrements in a single ordered bulk write.
+                # Each filter still requires enough stock, so a concurrent
+                # checkout that got there first makes the count come up short.
+                reservations = [
+                    UpdateOne(
+                        {"_id": product_id, "variants": {"$elemMatch": {"sku": sku, "stock_quantity": {"$gte": quantity}}}},
+                        {"$inc": {"variants.$.stock_quantity": -quantity}},
                     )
-                except Exception as e:
-                    logger.error(f"Stripe Error: {e}")
-                    raise HTTPException(status_code=500, detail=f"Payment Gateway Error")
-
-                # 4. Create Order
+                    for (product_id, sku), quantity in requested.items()
+                ]
+                result = await Product.get_motor_collection().bulk_write(reservations, ordered=True, session=session)
+                if result.modified_count != len(reservations):
+                    short = await _short_variant(requested)
+                    if short:
+                        raise _insufficient_stock(*short)
+                    raise HTTPException(status_code=409, detail="Stock changed during checkout, please try again")
+
+                # 3. Create Order. The payment intent is attached after commit,
+                # so the gateway's latency never holds the transaction open.
                 order = Order(
                     user_id=user.id,
                     status=OrderStatus.PENDING,
                     items=order_items,
                     total_amount=float(total_amount),
                     shipping_address=order_in.shipping_address,
-                    payment_intent_id=intent.id
                 )
                 await order.insert(session=session)
                 
-                # 5. Clear Cart
+                # 4. Clear Cart
                 await cart.delete(session=session)
-                
-                # Update metadata
-                stripe.PaymentIntent.modify(
-                    intent.id,
-                    metadata={"order_id": str(order.id)}
-                )
-                
-                return CreateOrderResponse(order=order, client_secret=intent.client_secret)
 
             except Exception as e:
                 logger.error(f"Order creation failed: {e}")
                 # Transaction will automatically abort when existing 'async with session.start_transaction()' block with error
                 raise e
 
-@router.get("/", response_model=List[Order])
-async def list_orders(user: User = Depends(get_current_active_user)):
-    return await Order.find(Order.user_id == user.id).sort(-Order.created_at).to_list()
+    # 5. Create the payment intent. If the gateway is down the order keeps its
+    # stock reservation and the outbox dispatcher attaches the intent later.
+    client_secret = await attach_payment_intent(order)
+    return CreateOrderResponse(order=order, client_secret=client_secret)
+
+def _parse_order_id(order_id: str) -> PydanticObjectId:
+    try:
+        return PydanticObjectId(order_id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid order ID")
+
+@router.get("/", response_model=Union[List[OrderSummary], List[Order]])
+async def list_orders(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    summary: bool = Query(False, description="Only id, status, total and item count per order"),
+    user: User = Depends(get_current_active_user)
+):
+    # Newest first straight off the (user_id, created_at, _id) index; the
+    # cursor seeks past the previous page instead of skipping through it
+    query = {"user_id": user.id}
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query.update(keyset_after(created_at, last_id))
+
+    sort = [("created_at", DESCENDING), ("_id", DESCENDING)]
+    if summary:
+        # $match/$sort/$limit run on the index; $project then counts items server-side
+        raw = await Order.get_motor_collection().aggregate([
+            {"$match": query},
+            {"$sort": dict(sort)},
+            {"$limit": limit},
+            {"$project": ORDER_SUMMARY_PROJECTION},
+        ]).to_list(limit)
+        orders = [OrderSummary.model_validate(doc) for doc in raw]
+        response_type = List[OrderSummary]
+    else:
+        orders = await Order.find(query).sort(sort).limit(limit).to_list()
+        response_type = List[Order]
+
+    if len(orders) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(orders[-1].created_at, orders[-1].id)
+    return model_response(response_type, orders, response)
+
+@router.get("/{order_id}", response_model=Order)
+async def get_order(order_id: str, user: User = Depends(get_current_active_user)):
+    order = await Order.get(_parse_order_id(order_id))
+    if not order or order.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return model_response(Order, order)
+
+@router.get("/{order_id}/payment", response_model=OrderPaymentResponse)
+async def get_order_payment(order_id: str, user: User = Depends(get_current_active_user)):
+    order = await Order.get(_parse_order_id(order_id))
+    if not order or order.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order.status != OrderStatus.PENDING:
+        raise HTTPException(status_code=409, detail="Order is not awaiting payment")
+
+    if order.payment_intent_id is None:
+        client_secret = await attach_payment_intent(order)
+    else:
+        try:
+            client_secret = (await get_payment_gateway().retrieve_intent(order.payment_intent_id)).client_secret
+        except PaymentGatewayError as e:
+            logger.warning(f"Could not retrieve payment intent for order {order.id}: {e}")
+            client_secret = None
+
+    if client_secret is None:
+        raise HTTPException(status_code=503, detail="Payment gateway unavailable, please retry")
+    return OrderPaymentResponse(
+        order_id=str(order.id),
+        payment_intent_id=order.payment_intent_id,
+        client_secret=client_secret,
+    )
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List
+
+from pymongo import ASCENDING, UpdateOne
+
+from app.core.config import get_settings
+from app.core.database import get_motor_client
+from app.core.metrics import register_collector
+from app.core.tasks import PeriodicTask
+from app.order.models import Order, OrderStatus
+from app.payment.gateway import PaymentGatewayError, get_payment_gateway
+from app.product.models import Product
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class SweeperStats:
+    def __init__(self):
+        self.orders_cancelled = 0
+        self.units_released = 0
+        self.conflicts = 0
+        self.skipped_payment_in_progress = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "orders_cancelled": self.orders_cancelled,
+            "units_released": self.units_released,
+            "conflicts": self.conflicts,
+            "skipped_payment_in_progress": self.skipped_payment_in_progress,
+        }
+
+sweeper_stats = SweeperStats()
+register_collector("reservation_sweeper", sweeper_stats.as_dict)
+
+class BatchConflict(Exception):
+    """An order in the batch changed status mid-sweep; retry on the next pass."""
+
+async def _void_payment(order: Order) -> bool:
+    # Cancel the intent first so nobody can pay for an order we are about to
+    # cancel. If that fails (already paid, processing, gateway down) the
+    # order is left alone; the webhook or the next sweep settles it.
+    if order.payment_intent_id is None:
+        return True
+    gateway = get_payment_gateway()
+    try:
+        await gateway.cancel_intent(order.payment_intent_id)
+        return True
+    except PaymentGatewayError as e:
+        error = e
+
+    # Cancelling twice is an error. An earlier sweep may have cancelled the
+    # intent and then not released the order (conflict, crash in between).
+    try:
+        intent = await gateway.retrieve_intent(order.payment_intent_id)
+        if intent.status == "canceled":
+            return True
+    except PaymentGatewayError:
+        pass
+    logger.info(f"Keeping reservation for order {order.id}: {error}")
+    return False
+
+async def cancel_and_release(orders: List[Order]) -> int:
+    """
+    Cancel the orders that are still PENDING and return their stock in a
+    single transaction. Orders paid or cancelled since the sweep read them
+    are left out. Returns how many orders were cancelled.
+    """
+    client = get_motor_client()
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            pending = await Order.get_motor_collection().distinct(
+                "_id",
+                {"_id": {"$in": [order.id for order in orders]}, "status": OrderStatus.PENDING.value},
+                session=session,
+            )
+            pending = set(pending)
+            orders = [order for order in orders if order.id in pending]
+            if not orders:
+                return 0
+
+            ids = [order.id for order in orders]
+            restock = {}
+            for order in orders:
+                for item in order.items:
+                    key = (item.product_id, item.variant_sku)
+                    restock[key] = restock.get(key, 0) + item.quantity
+
+            result = await Order.get_motor_collection().update_many(
+                {"_id": {"$in": ids}, "status": OrderStatus.PENDING.value},
+                {"$set": {"status": OrderStatus.CANCELLED.value, "cancelled_at": datetime.utcnow()}},
+                session=session,
+            )
+            if result.modified_count != len(ids):
+                # Changed between the read and the write above
+                raise BatchConflict()
+
+            if restock:
+                await Product.get_motor_collection().bulk_write(
+                    [
+                        UpdateOne(
+                            {"_id": product_id, "variants.sku": sku},
+                            {"$inc": {"variants.$.stock_quantity": quantity}},
+                        )
+                        for (product_id, sku), quantity in restock.items()
+                    ],
+                    ordered=False,
+                    session=session,
+                )
+
+    sweeper_stats.orders_cancelled += len(ids)
+    sweeper_stats.units_released += sum(restock.values())
+    return len(ids)
+
+async def release_expired_reservations() -> None:
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.ORDER_RESERVATION_HOLD_MINUTES)
+    last = None
+    while True:
+        # Served by the (status, created_at) index, oldest first
+        query = {"status": OrderStatus.PENDING.value, "created_at": {"$lt": cutoff}}
+        if last is not None:
+            # Orders we skipped stay PENDING; page past them instead of re-reading
+            query["$or"] = [
+                {"created_at": {"$gt": last.created_at}},
+                {"created_at": last.created_at, "_id": {"$gt": last.id}},
+            ]
+        orders = await Order.find(query).sort(
+            [("created_at", ASCENDING), ("_id", ASCENDING)]
+        ).limit(settings.RESERVATION_SWEEP_BATCH_SIZE).to_list()
+        if not orders:
+            return
+
+        voided = await asyncio.gather(*(_void_payment(order) for order in orders))
+        releasable = [order for order, ok in zip(orders, voided) if ok]
+        sweeper_stats.skipped_payment_in_progress += len(orders) - len(releasable)
+
+        if releasable:
+            try:
+                await cancel_and_release(releasable)
+            except BatchConflict:
+                sweeper_stats.conflicts += 1
+                return
+
+        if len(orders) < settings.RESERVATION_SWEEP_BATCH_SIZE:
+            return
+        last = orders[-1]
+
+reservation_sweeper = PeriodicTask(
+    "reservation_sweeper",
+    interval_seconds=settings.RESERVATION_SWEEP_INTERVAL_SECONDS,
+    fn=release_expired_reservations,
+)
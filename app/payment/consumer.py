@@ -0,0 +1,131 @@
+import logging
+import time
+from datetime import datetime
+from typing import List
+
+from beanie import PydanticObjectId
+from beanie.operators import In
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from app.core.config import get_settings
+from app.core.metrics import register_collector
+from app.core.tasks import PeriodicTask
+from app.analytics.rollups import sales_rollup_task
+from app.order.models import Order, OrderStatus
+from app.payment.models import PaymentEvent, PaymentEventStatus
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class ConsumerStats:
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.orders_updated = 0
+        self.lag_seconds = 0.0
+        self.busy_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "orders_updated": self.orders_updated,
+            # Age of the oldest event still waiting when the last batch was picked up
+            "lag_seconds": round(self.lag_seconds, 3),
+            "events_per_busy_second": round(self.processed / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+        }
+
+consumer_stats = ConsumerStats()
+register_collector("payment_events", consumer_stats.as_dict)
+
+def order_update_for(event: PaymentEvent):
+    """
+    The conditional order update for an event, or None if the event doesn't
+    change order state. Conditions make replays and out-of-order delivery
+    harmless: an order only moves forward from the status it was expected in.
+    """
+    if event.type == "charge.refunded":
+        # Partial refunds leave the order as it is
+        if not event.refunded or not event.payment_intent_id:
+            return None
+        return UpdateOne(
+            {
+                "payment_intent_id": event.payment_intent_id,
+                "status": {"$in": [OrderStatus.PAID.value, OrderStatus.SHIPPED.value]},
+            },
+            {"$set": {"status": OrderStatus.REFUNDED.value, "refunded_at": event.received_at}},
+        )
+
+    if event.type != "payment_intent.succeeded" or not event.order_id:
+        return None
+    try:
+        order_id = PydanticObjectId(event.order_id)
+    except InvalidId:
+        return None
+    return UpdateOne(
+        {"_id": order_id, "status": OrderStatus.PENDING.value},
+        {"$set": {"status": OrderStatus.PAID.value, "paid_at": event.received_at}},
+    )
+
+async def apply_batch(events: List[PaymentEvent]) -> bool:
+    operations = [op for op in (order_update_for(e) for e in events) if op is not None]
+    ids = [e.id for e in events]
+    now = datetime.utcnow()
+
+    try:
+        if operations:
+            result = await Order.get_motor_collection().bulk_write(operations, ordered=False)
+            consumer_stats.orders_updated += result.modified_count
+            if result.modified_count:
+                # Paid and refunded orders feed the sales rollups
+                sales_rollup_task.wake()
+    except Exception as e:
+        logger.exception("Applying payment events failed")
+        # Retried on the next pass until PAYMENT_EVENT_MAX_ATTEMPTS
+        await PaymentEvent.find(In(PaymentEvent.id, ids)).update({"$inc": {"attempts": 1}, "$set": {"error": str(e)}})
+        failed = await PaymentEvent.find(
+            In(PaymentEvent.id, ids), PaymentEvent.attempts >= settings.PAYMENT_EVENT_MAX_ATTEMPTS
+        ).update({"$set": {"status": PaymentEventStatus.FAILED, "processed_at": now}})
+        consumer_stats.failed += failed.modified_count
+        return False
+
+    for event in events:
+        if event.type == "payment_intent.payment_failed":
+            # The order stays PENDING so the customer can retry payment
+            logger.info(f"Payment failed: {event.payment_intent_id}")
+
+    await PaymentEvent.find(In(PaymentEvent.id, ids)).update(
+        {"$set": {"status": PaymentEventStatus.PROCESSED, "processed_at": now}}
+    )
+    consumer_stats.processed += len(events)
+    return True
+
+async def process_payment_events() -> None:
+    # Drain the queue in batches; the next pass picks up anything newer
+    while True:
+        events = await PaymentEvent.find(
+            PaymentEvent.status == PaymentEventStatus.RECEIVED
+        ).sort(+PaymentEvent.received_at).limit(settings.PAYMENT_EVENT_BATCH_SIZE).to_list()
+
+        if not events:
+            consumer_stats.lag_seconds = 0.0
+            return
+
+        started_at = time.perf_counter()
+        consumer_stats.lag_seconds = (datetime.utcnow() - events[0].received_at).total_seconds()
+        applied = await apply_batch(events)
+        consumer_stats.batches += 1
+        consumer_stats.busy_seconds += time.perf_counter() - started_at
+
+        # Back off until the next poll after a failure instead of spinning
+        if not applied or len(events) < settings.PAYMENT_EVENT_BATCH_SIZE:
+            return
+
+payment_event_consumer = PeriodicTask(
+    "payment_event_consumer",
+    interval_seconds=settings.PAYMENT_EVENT_POLL_SECONDS,
+    fn=process_payment_events,
+)
@@ -0,0 +1,163 @@
+import asyncio
+import importlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, Optional
+from pydantic import BaseModel
+from app.core.config import get_settings
+
+class PaymentIntent(BaseModel):
+    id: str
+    client_secret: Optional[str] = None
+    status: str
+    amount: int
+    currency: str
+    metadata: Dict[str, str] = {}
+
+class PaymentGatewayError(Exception):
+    pass
+
+class PaymentGateway:
+    """
+    Payment provider interface used by checkout. Implementations must not
+    block the event loop and must honour `idempotency_key`, so a retried
+    create returns the intent made by the first attempt.
+    """
+
+    async def create_intent(
+        self, amount: int, currency: str, metadata: Dict[str, str], idempotency_key: str
+    ) -> PaymentIntent:
+        raise NotImplementedError
+
+    async def retrieve_intent(self, intent_id: str) -> PaymentIntent:
+        raise NotImplementedError
+
+    async def cancel_intent(self, intent_id: str) -> PaymentIntent:
+        raise NotImplementedError
+
+class StripeGateway(PaymentGateway):
+    """
+    stripe-python only ships a blocking client, so calls run on a small
+    dedicated thread pool with a per-request HTTP timeout and an overall
+    deadline on top.
+    """
+
+    def __init__(self, api_key: str, timeout_seconds: float, max_network_retries: int, max_workers: int):
+        import stripe
+
+        self._stripe = stripe
+        self._client = stripe.StripeClient(
+            api_key,
+            http_client=stripe.new_default_http_client(timeout=timeout_seconds),
+            max_network_retries=max_network_retries,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stripe")
+        self._deadline_seconds = timeout_seconds * (max_network_retries + 1)
+
+    async def _call(self, fn, *args, **kwargs) -> PaymentIntent:
+        loop = asyncio.get_running_loop()
+        try:
+            intent = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, partial(fn, *args, **kwargs)),
+                timeout=self._deadline_seconds,
+            )
+        except asyncio.TimeoutError as e:
+            raise PaymentGatewayError("Payment gateway timed out") from e
+        except self._stripe.StripeError as e:
+            raise PaymentGatewayError(str(e)) from e
+
+        return PaymentIntent(
+            id=intent.id,
+            client_secret=intent.client_secret,
+            status=intent.status,
+            amount=intent.amount,
+            currency=intent.currency,
+            metadata=dict(intent.metadata or {}),
+        )
+
+    async def create_intent(self, amount, currency, metadata, idempotency_key):
+        return await self._call(
+            self._client.payment_intents.create,
+            params={
+                "amount": amount,
+                "currency": currency,
+                "metadata": metadata,
+                "automatic_payment_methods": {"enabled": True},
+            },
+            options={"idempotency_key": idempotency_key},
+        )
+
+    async def retrieve_intent(self, intent_id):
+        return await self._call(self._client.payment_intents.retrieve, intent_id)
+
+    async def cancel_intent(self, intent_id):
+        return await self._call(self._client.payment_intents.cancel, intent_id)
+
+class FakePaymentGateway(PaymentGateway):
+    """In-memory gateway for tests and benchmarks; never touches the network."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.intents: Dict[str, PaymentIntent] = {}
+        self._by_idempotency_key: Dict[str, str] = {}
+        self.fail_next = 0  # number of upcoming calls that should fail
+
+    async def _simulate(self) -> None:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise PaymentGatewayError("Simulated gateway failure")
+
+    async def create_intent(self, amount, currency, metadata, idempotency_key):
+        await self._simulate()
+        if idempotency_key in self._by_idempotency_key:
+            return self.intents[self._by_idempotency_key[idempotency_key]]
+
+        intent_id = f"pi_fake_{uuid.uuid4().hex[:24]}"
+        intent = PaymentIntent(
+            id=intent_id,
+            client_secret=f"{intent_id}_secret_{uuid.uuid4().hex[:12]}",
+            status="requires_payment_method",
+            amount=amount,
+            currency=currency,
+            metadata=dict(metadata),
+        )
+        self.intents[intent_id] = intent
+        self._by_idempotency_key[idempotency_key] = intent_id
+        return intent
+
+    async def retrieve_intent(self, intent_id):
+        await self._simulate()
+        if intent_id not in self.intents:
+            raise PaymentGatewayError(f"No such payment_intent: {intent_id}")
+        return self.intents[intent_id]
+
+    async def cancel_intent(self, intent_id):
+        intent = await self.retrieve_intent(intent_id)
+        # Like Stripe, which refuses to cancel an intent twice
+        if intent.status == "canceled":
+            raise PaymentGatewayError(
+                f"You cannot cancel this PaymentIntent because it has a status of canceled: {intent_id}"
+            )
+        intent.status = "canceled"
+        return intent
+
+@lru_cache()
+def get_payment_gateway() -> PaymentGateway:
+    settings = get_settings()
+    if settings.PAYMENT_GATEWAY == "fake":
+        return FakePaymentGateway(latency_seconds=settings.FAKE_PAYMENT_LATENCY_SECONDS)
+    return StripeGateway(
+        api_key=settings.STRIPE_SECRET_KEY,
+        timeout_seconds=settings.STRIPE_TIMEOUT_SECONDS,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        max_workers=settings.STRIPE_MAX_WORKERS,
+    )
+
+async def preload_payment_gateway() -> None:
+    # Importing stripe takes about a second. Do it on a thread after startup
+    # instead of on the event loop in the first checkout.
+    if get_settings().PAYMENT_GATEWAY != "fake":
+        await asyncio.to_thread(importlib.import_module, "stripe")
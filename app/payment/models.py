@@ -0,0 +1,34 @@
+from beanie import Document, Indexed
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+class PaymentEventStatus(str, Enum):
+    RECEIVED = "RECEIVED"
+    PROCESSED = "PROCESSED"
+    FAILED = "FAILED"
+
+class PaymentEvent(Document):
+    # Stripe's event id; the unique index makes redelivered events no-ops
+    event_id: Indexed(str, unique=True)
+    type: str
+    payment_intent_id: Optional[str] = None
+    order_id: Optional[str] = None
+    # charge.refunded only: whether the whole charge has been refunded
+    refunded: Optional[bool] = None
+    status: PaymentEventStatus = PaymentEventStatus.RECEIVED
+    attempts: int = 0
+    error: Optional[str] = None
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
+
+    class Settings:
+        name = "payment_events"
+        indexes = [
+            # Consumer queue: oldest unprocessed first
+            IndexModel([("status", ASCENDING), ("received_at", ASCENDING)], name="status_received_at"),
+            # Keep processed events long enough to dedupe Stripe's retries (up to 3 days)
+            IndexModel([("processed_at", ASCENDING)], name="processed_at_ttl", expireAfterSeconds=30 * 24 * 3600),
+        ]
@@ -0,0 +1,77 @@
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from app.core.config import get_settings
+from app.core.tasks import PeriodicTask
+from app.order.models import Order, OrderStatus
+from app.payment.gateway import PaymentGatewayError, get_payment_gateway
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Orders are the outbox: a PENDING order without payment_intent_id still
+# needs an intent. Checkout tries to attach one right after committing;
+# whatever fails there is retried by the dispatcher below.
+
+def amount_in_cents(amount) -> int:
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1")))
+
+async def attach_payment_intent(order: Order) -> Optional[str]:
+    """
+    Create the order's payment intent (idempotent per order) and record its
+    id. Returns the client secret, or None if the gateway is unavailable.
+    """
+    try:
+        intent = await get_payment_gateway().create_intent(
+            amount=amount_in_cents(order.total_amount),
+            currency=order.currency.lower(),
+            metadata={"user_id": str(order.user_id), "order_id": str(order.id)},
+            idempotency_key=f"order-{order.id}",
+        )
+    except PaymentGatewayError as e:
+        logger.warning(f"Could not create payment intent for order {order.id}: {e}")
+        return None
+
+    result = await Order.find_one(
+        Order.id == order.id,
+        Order.status == OrderStatus.PENDING,
+        Order.payment_intent_id == None,
+    ).update({"$set": {"payment_intent_id": intent.id}})
+    if not result.modified_count:
+        current = await Order.get(order.id)
+        if current is None or current.payment_intent_id != intent.id:
+            # The order was cancelled (e.g. its reservation expired and the
+            # sweeper released the stock) while the intent was being created.
+            # Nobody may pay for it.
+            await _cancel_orphaned_intent(order, intent.id)
+            return None
+        # Attached concurrently by checkout or another dispatcher run
+
+    order.payment_intent_id = intent.id
+    return intent.client_secret
+
+async def _cancel_orphaned_intent(order: Order, intent_id: str) -> None:
+    try:
+        await get_payment_gateway().cancel_intent(intent_id)
+    except PaymentGatewayError as e:
+        logger.error(f"Could not cancel payment intent {intent_id} of cancelled order {order.id}: {e}")
+
+async def dispatch_pending_intents() -> None:
+    # The grace period leaves fresh orders to the checkout request itself
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.PAYMENT_OUTBOX_GRACE_SECONDS)
+    orders = await Order.find(
+        Order.status == OrderStatus.PENDING,
+        Order.payment_intent_id == None,
+        Order.created_at < cutoff,
+    ).sort(+Order.created_at).limit(settings.PAYMENT_OUTBOX_BATCH_SIZE).to_list()
+
+    for order in orders:
+        await attach_payment_intent(order)
+
+payment_intent_dispatcher = PeriodicTask(
+    "payment_intent_dispatcher",
+    interval_seconds=settings.PAYMENT_OUTBOX_INTERVAL_SECONDS,
+    fn=dispatch_pending_intents,
+)
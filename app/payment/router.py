@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Request, Header
-from app.order.models import Order, OrderStatus
+from pymongo.errors import DuplicateKeyError
 from app.core.config import get_settings
-import stripe
+from app.payment.models import PaymentEvent
+from app.payment.consumer import payment_event_consumer
 
 router = APIRouter()
 settings = get_settings()
@@ -10,6 +11,10 @@ settings = get_settings()
 async def payment_webhook(request: Request, stripe_signature: str = Header(None)):
     payload = await request.body()
     
+    # Imported here rather than at module level to keep it out of worker
+    # startup; by the first webhook the lifespan has usually preloaded it
+    import stripe
+
     try:
         event = stripe.Webhook.construct_event(
             payload, stripe_signature, settings.STRIPE_WEBHOOK_SECRET
@@ -21,19 +26,23 @@ async def payment_webhook(request: Request, stripe_signature: str = Header(None)
         # Invalid signature
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    if event["type"] == "payment_intent.succeeded":
-        payment_intent = event["data"]["object"]
-        order_id = payment_intent.get("metadata", {}).get("order_id")
-        
-        if order_id:
-            order = await Order.get(order_id)
-            if order:
-                order.status = OrderStatus.PAID
-                await order.save()
-                
-    elif event["type"] == "payment_intent.payment_failed":
-        # Handle failure (stock rollback should happen here or via background task)
-        # For now, we just log it
-        print(f"Payment failed: {event['data']['object']['id']}")
-        
+    # Persist and acknowledge; order updates happen in the background consumer
+    obj = event["data"]["object"]
+    payment_event = PaymentEvent(
+        event_id=event["id"],
+        type=event["type"],
+        payment_intent_id=obj.get("id"),
+        order_id=(obj.get("metadata") or {}).get("order_id"),
+    )
+    if obj.get("object") == "charge":
+        # Charge events (refunds) point at their payment intent
+        payment_event.payment_intent_id = obj.get("payment_intent")
+        payment_event.refunded = obj.get("refunded")
+    try:
+        await payment_event.insert()
+    except DuplicateKeyError:
+        # Stripe redelivery of an event we already have
+        return {"status": "success"}
+
+    payment_event_consumer.wake()
     return {"status": "success"}
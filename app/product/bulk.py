@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+
+import orjson
+from beanie.odm.utils.encoder import Encoder
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.config import get_settings
+from app.product.cache import bump_catalog_version, clear_product_caches
+from app.product.images import describe_images
+from app.product.models import Product, ProductCreate
+from app.product.skus import duplicate_sku
+
+settings = get_settings()
+
+# NDJSON catalog import/export: one ProductCreate object per line. Imports
+# upsert by slug in batched bulk_writes; a bad line is reported and skipped
+# without failing the rest of its batch. Both directions stream, so neither
+# the upload nor the catalog is ever held in memory as a whole.
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Per-line errors beyond this are only counted
+MAX_REPORTED_ERRORS = 100
+
+class LineError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[LineError] = []
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(LineError(line=line, error=error))
+
+async def ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into (line number, line) pairs. Blank lines are
+    skipped; a line longer than PRODUCT_IMPORT_MAX_LINE_BYTES is yielded as
+    None instead of being buffered.
+    """
+    max_bytes = settings.PRODUCT_IMPORT_MAX_LINE_BYTES
+    partial = b""
+    line_no = 0
+    too_long = False
+    async for chunk in chunks:
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        for line in lines:
+            line_no += 1
+            if too_long or len(line) > max_bytes:
+                too_long = False
+                yield line_no, None
+            elif line.strip():
+                yield line_no, line
+        if len(partial) > max_bytes:
+            # Drop the rest of this line as it arrives
+            too_long = True
+            partial = b""
+    if too_long or len(partial) > max_bytes:
+        yield line_no + 1, None
+    elif partial.strip():
+        yield line_no + 1, partial
+
+def parse_product(line: bytes) -> ProductCreate:
+    product_in = ProductCreate.model_validate(orjson.loads(line))
+    if not product_in.variants:
+        raise ValueError("At least one variant is required")
+    skus = [v.sku for v in product_in.variants]
+    if len(skus) != len(set(skus)):
+        raise ValueError("Duplicate SKUs in variants")
+    return product_in
+
+def _error_message(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc']) or 'line'}: {err['msg']}" for err in e.errors()
+        )
+    if isinstance(e, orjson.JSONDecodeError):
+        return f"Invalid JSON: {e}"
+    return str(e)
+
+_encoder = Encoder(to_db=True)
+
+async def upsert_operations(products: List[ProductCreate]) -> List[UpdateOne]:
+    renditions = await asyncio.gather(*(describe_images(p.images) for p in products))
+    now = datetime.utcnow()
+    operations = []
+    for product_in, image_renditions in zip(products, renditions):
+        # Built through the model so effective prices and defaults match create_product
+        product = Product(**product_in.model_dump(), image_renditions=image_renditions)
+        fields = _encoder.encode(product.model_dump(exclude={"id", "revision_id", "created_at"}))
+        operations.append(UpdateOne(
+            {"slug": product.slug},
+            {"$set": fields, "$setOnInsert": {"created_at": now}},
+            upsert=True,
+        ))
+    return operations
+
+async def _write_batch(batch: List[Tuple[int, ProductCreate]], result: ImportResult) -> None:
+    operations = await upsert_operations([product_in for _, product_in in batch])
+    try:
+        written = await Product.get_motor_collection().bulk_write(operations, ordered=False)
+        details = written.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for err in details.get("writeErrors", []):
+            line, product_in = batch[err["index"]]
+            sku = duplicate_sku(DuplicateKeyError(err.get("errmsg", ""), err.get("code"), err))
+            if sku is not None:
+                result.fail(line, f"SKU {sku} is already used by another product")
+            else:
+                result.fail(line, err.get("errmsg", "Write failed"))
+    result.created += details.get("nUpserted", 0)
+    result.updated += details.get("nMatched", 0)
+
+async def import_products(chunks: AsyncIterable[bytes]) -> ImportResult:
+    result = ImportResult()
+    batch: List[Tuple[int, ProductCreate]] = []
+    async for line_no, line in ndjson_lines(chunks):
+        if line is None:
+            result.fail(line_no, f"Line exceeds {settings.PRODUCT_IMPORT_MAX_LINE_BYTES} bytes")
+            continue
+        try:
+            batch.append((line_no, parse_product(line)))
+        except (ValueError, ValidationError) as e:
+            result.fail(line_no, _error_message(e))
+            continue
+        if len(batch) >= settings.PRODUCT_IMPORT_BATCH_SIZE:
+            await _write_batch(batch, result)
+            batch = []
+    if batch:
+        await _write_batch(batch, result)
+
+    if result.created or result.updated:
+        # Too many products to invalidate one by one; start every cache over
+        clear_product_caches()
+        await bump_catalog_version()
+    return result
+
+def export_line(product: Product) -> bytes:
+    product_out = ProductCreate.model_validate(
+        product.model_dump(mode="json", include=set(ProductCreate.model_fields))
+    )
+    return product_out.model_dump_json().encode() + b"\n"
+
+async def export_products() -> AsyncIterator[bytes]:
+    """NDJSON lines for every product, in _id order, read through a cursor."""
+    async for product in Product.find_all(sort="_id", batch_size=settings.PRODUCT_EXPORT_BATCH_SIZE):
+        yield export_line(product)
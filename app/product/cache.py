@@ -0,0 +1,109 @@
+import time
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.versions import VersionWatcher, bump_version
+from app.product.models import Product
+
+settings = get_settings()
+
+# slug -> Product
+product_detail_cache = TTLCache(
+    "product_detail",
+    ttl_seconds=settings.PRODUCT_CACHE_TTL_SECONDS,
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+)
+
+# (cursor, skip, limit, CatalogFilter.cache_key()) -> (List[Product], next_cursor)
+product_list_cache = TTLCache(
+    "product_list",
+    ttl_seconds=settings.PRODUCT_CACHE_TTL_SECONDS,
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+)
+
+# filter key -> CatalogFacets
+product_facets_cache = TTLCache(
+    "product_facets",
+    ttl_seconds=settings.PRODUCT_CACHE_TTL_SECONDS,
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+)
+
+# product id -> PricingSnapshot (see app.product.pricing)
+product_pricing_cache = TTLCache(
+    "product_pricing",
+    ttl_seconds=settings.PRODUCT_PRICING_CACHE_TTL_SECONDS,
+    max_entries=settings.PRODUCT_PRICING_CACHE_MAX_ENTRIES,
+)
+
+# sku -> product id (see app.product.skus). Only the mapping is cached;
+# stock is always read fresh.
+sku_cache = TTLCache(
+    "sku_lookup",
+    ttl_seconds=settings.PRODUCT_CACHE_TTL_SECONDS,
+    max_entries=settings.SKU_CACHE_MAX_ENTRIES,
+)
+
+def _is_filtered(list_key) -> bool:
+    return any(value is not None for value in list_key[-1])
+
+def invalidate_product(product: Product, listing_changed: bool, variants_changed: bool = False) -> None:
+    """
+    Drop cache entries affected by a write to `product`.
+
+    `listing_changed` means the set or order of published products changed
+    (create, delete, publish/unpublish), which shifts every listing page.
+    Otherwise only the pages that actually contain the product are dropped,
+    plus, if its variants or prices changed (`variants_changed`), every
+    size/color/price filtered page, since the product may match one it
+    isn't on yet.
+    """
+    product_detail_cache.invalidate(product.slug)
+    product_pricing_cache.invalidate(product.id)
+    # By product rather than by SKU, so SKUs removed by an update go too
+    sku_cache.invalidate_where(lambda _, product_id: product_id == product.id)
+    product_facets_cache.clear()
+    if listing_changed:
+        product_list_cache.clear()
+    else:
+        product_list_cache.invalidate_where(
+            lambda key, page: (variants_changed and _is_filtered(key))
+            or any(p.id == product.id for p in page[0])
+        )
+
+# Shared revision of the whole catalog, bumped on every product write.
+# Catalog ETags are derived from it, so conditional requests are answered
+# without touching the products collection.
+CATALOG_VERSION = "catalog"
+catalog_version = VersionWatcher(CATALOG_VERSION, poll_seconds=settings.CATALOG_VERSION_POLL_SECONDS)
+_seen_catalog_version = None
+
+def clear_product_caches() -> None:
+    for cache in (product_detail_cache, product_list_cache, product_facets_cache, product_pricing_cache, sku_cache):
+        cache.clear()
+
+async def current_catalog_version() -> int:
+    global _seen_catalog_version
+    version = await catalog_version.current()
+    if _seen_catalog_version is not None and version != _seen_catalog_version:
+        # Another worker (or a CLI) wrote products; don't wait out the TTL
+        clear_product_caches()
+    _seen_catalog_version = version
+    return version
+
+async def bump_catalog_version() -> None:
+    # Called after invalidate_product, which already dropped what this write
+    # affected locally
+    global _seen_catalog_version
+    version = await bump_version(CATALOG_VERSION)
+    catalog_version.observe(version)
+    _seen_catalog_version = version
+
+async def catalog_etag() -> str:
+    """
+    Weak ETag for catalog responses. Stock moves (checkout, expired
+    reservations) don't bump the version, so the tag also rolls over every
+    PRODUCT_CACHE_TTL_SECONDS: the same staleness bound as the caches.
+    """
+    version = await current_catalog_version()
+    epoch = int(time.time() // max(settings.PRODUCT_CACHE_TTL_SECONDS, 1))
+    return f'W/"{version}.{epoch}"'
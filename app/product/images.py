@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.metrics import register_collector
+from app.product.models import ImageRendition, ProductImage
+from app.product.uploads import UPLOAD_URL_PREFIX, upload_path
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Rendition name -> max width in pixels. Images are never upscaled.
+RENDITION_WIDTHS = {
+    "thumbnail": 160,
+    "card": 480,
+    "detail": 1200,
+}
+
+def rendition_filename(filename: str, name: str, ext: Optional[str] = None) -> str:
+    # <sha256>.png -> <sha256>.card.png / <sha256>.card.webp
+    stem, original_ext = os.path.splitext(filename)
+    return f"{stem}.{name}.{ext or original_ext.lstrip('.')}"
+
+def render_image(path: str) -> Dict[str, dict]:
+    """
+    Write every rendition of the image at `path` next to it and return
+    {name: {"width", "filename", "webp_filename"}}. Runs in a worker process;
+    renditions that already exist (same content hash) are not redone.
+    """
+    from PIL import Image, ImageOps
+
+    directory, filename = os.path.split(path)
+    ext = os.path.splitext(filename)[1].lstrip(".")
+    renditions = {}
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode == "P":
+            image = image.convert("RGBA")
+        for name, max_width in RENDITION_WIDTHS.items():
+            width = min(max_width, image.width)
+            height = max(1, round(image.height * width / image.width))
+            out_name = rendition_filename(filename, name)
+            webp_name = rendition_filename(filename, name, "webp")
+            renditions[name] = {"width": width, "filename": out_name, "webp_filename": webp_name}
+
+            out_path = os.path.join(directory, out_name)
+            webp_path = os.path.join(directory, webp_name)
+            if os.path.exists(out_path) and os.path.exists(webp_path):
+                continue
+
+            resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image
+            if ext == "jpg":
+                resized.convert("RGB").save(out_path, "JPEG", quality=85, optimize=True, progressive=True)
+            elif ext == "png":
+                resized.save(out_path, "PNG", optimize=True)
+            else:
+                resized.save(out_path, "WEBP", quality=80, method=4)
+            if webp_path != out_path:
+                resized.save(webp_path, "WEBP", quality=80, method=4)
+    return renditions
+
+class ImageRenditionPool:
+    """
+    Resizes images in a small process pool so Pillow never competes with the
+    event loop for the GIL. At most `max_pending` images are submitted at
+    once; further uploads wait their turn in the request.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        # Started on first use, so importing the app never forks
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max_pending)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.run_seconds = 0.0
+
+    async def render(self, path: str) -> Optional[Dict[str, dict]]:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, render_image, path)
+        except Exception as e:
+            # Corrupt or truncated image; the original is still served as is
+            self.failed += 1
+            logger.warning(f"Could not render {path}: {e!r}")
+            return None
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+        self.completed += 1
+        self.run_seconds += time.perf_counter() - started_at
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_run_ms": round(self.run_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+image_renderer = ImageRenditionPool(max_workers=settings.IMAGE_WORKERS, max_pending=settings.IMAGE_MAX_PENDING)
+register_collector("image_renderer", image_renderer.stats)
+
+async def renditions_for(url: str) -> Dict[str, ImageRendition]:
+    """Renditions of an uploaded image, generating any that are missing."""
+    path = upload_path(url)
+    if path is None:
+        return {}
+    rendered = await image_renderer.render(path)
+    if not rendered:
+        return {}
+    return {
+        name: ImageRendition(
+            width=r["width"],
+            url=UPLOAD_URL_PREFIX + r["filename"],
+            webp_url=UPLOAD_URL_PREFIX + r["webp_filename"],
+        )
+        for name, r in rendered.items()
+    }
+
+async def describe_images(urls: List[str]) -> List[ProductImage]:
+    renditions = await asyncio.gather(*(renditions_for(url) for url in urls))
+    return [ProductImage(url=url, renditions=r) for url, r in zip(urls, renditions)]
@@ -1,8 +1,9 @@
 from beanie import Document, Indexed, DecimalAnnotation
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from decimal import Decimal
 
 class ProductSize(str, Enum):
@@ -18,6 +19,48 @@ class ProductVariant(BaseModel):
     color: str
     stock_quantity: int = Field(..., ge=0)
     price_adjustment: DecimalAnnotation = Decimal("0.00")
+    # base_price + price_adjustment, stored so price filters can use an index
+    effective_price: Optional[DecimalAnnotation] = None
+
+class ImageRendition(BaseModel):
+    width: int
+    url: str
+    # Same size re-encoded as WebP, for clients that accept it
+    webp_url: Optional[str] = None
+
+class ProductImage(BaseModel):
+    url: str
+    # "thumbnail" / "card" / "detail" -> resized copy; empty for external images
+    renditions: Dict[str, ImageRendition] = {}
+
+# Admin input, shared by the create endpoint and the NDJSON import
+class ProductVariantCreate(BaseModel):
+    sku: str
+    size: str
+    color: str
+    stock_quantity: int
+    price_adjustment: Optional[Decimal] = Decimal("0.00")
+
+class ProductCreate(BaseModel):
+    title: str
+    description: str
+    base_price: Decimal
+    slug: str
+    variants: List[ProductVariantCreate] = []
+    images: List[str] = []
+    is_published: bool = True
+
+def variant_price(base_price, price_adjustment) -> Decimal:
+    return Decimal(str(base_price)) + Decimal(str(price_adjustment or 0))
+
+def price_variants(base_price, variants: Iterable[BaseModel]) -> List[ProductVariant]:
+    """Build ProductVariants with effective_price derived from base_price."""
+    priced = []
+    for variant in variants:
+        data = variant.model_dump(exclude={"effective_price"})
+        data["effective_price"] = variant_price(base_price, data.get("price_adjustment"))
+        priced.append(ProductVariant(**data))
+    return priced
 
 class Product(Document):
     title: str
@@ -25,9 +68,45 @@ class Product(Document):
     base_price: DecimalAnnotation
     slug: Indexed(str, unique=True)
     images: List[str] = []
+    # Renditions of each entry in `images`, in the same order
+    image_renditions: List[ProductImage] = []
     variants: List[ProductVariant] = []
     is_published: bool = True
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    _variants_by_sku: Optional[Dict[str, ProductVariant]] = PrivateAttr(default=None)
+    _variants_indexed: Optional[List[ProductVariant]] = PrivateAttr(default=None)
+
+    def variant(self, sku: str) -> Optional[ProductVariant]:
+        # sku -> variant map built once per variants list, instead of a scan per lookup
+        if self._variants_indexed is not self.variants or len(self._variants_by_sku) != len(self.variants):
+            self._variants_by_sku = {v.sku: v for v in self.variants}
+            self._variants_indexed = self.variants
+        return self._variants_by_sku.get(sku)
+
+    @model_validator(mode="after")
+    def _compute_effective_prices(self):
+        for variant in self.variants:
+            variant.effective_price = variant_price(self.base_price, variant.price_adjustment)
+        return self
 
     class Settings:
         name = "products"
+        indexes = [
+            # Keyset pagination for the storefront listing (newest first)
+            IndexModel(
+                [("is_published", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="published_created_at_id",
+            ),
+            # Catalog facets; multikey over the embedded variants
+            IndexModel([("is_published", ASCENDING), ("variants.size", ASCENDING)], name="published_variant_size"),
+            IndexModel([("is_published", ASCENDING), ("variants.color", ASCENDING)], name="published_variant_color"),
+            IndexModel([("is_published", ASCENDING), ("variants.effective_price", ASCENDING)], name="published_variant_price"),
+            # SKUs are unique across the whole catalog, not just within a product
+            IndexModel(
+                [("variants.sku", ASCENDING)],
+                name="variants_sku_unique",
+                unique=True,
+                partialFilterExpression={"variants.sku": {"$exists": True}},
+            ),
+        ]
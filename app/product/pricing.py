@@ -0,0 +1,89 @@
+from decimal import Decimal
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from beanie import PydanticObjectId
+from bson import Decimal128
+
+from app.product.cache import product_pricing_cache
+from app.product.models import Product, variant_price
+
+# Only what a cart line needs; descriptions, the rest of the images and
+# stock levels are never read.
+PRICING_PROJECTION = {
+    "title": 1,
+    "base_price": 1,
+    "images": {"$slice": 1},
+    "image_renditions": {"$slice": 1},
+    "variants.sku": 1,
+    "variants.price_adjustment": 1,
+    "variants.effective_price": 1,
+}
+
+class PricingSnapshot(NamedTuple):
+    title: str
+    image: Optional[str]
+    base_price: Decimal
+    # sku -> base_price + price_adjustment
+    prices: Dict[str, Decimal]
+
+    def price_for(self, sku: str) -> Decimal:
+        # Unknown SKUs (variant removed since it was added) fall back to the base price
+        return self.prices.get(sku, self.base_price)
+
+def _decimal(value) -> Decimal:
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    return Decimal(str(value or 0))
+
+def snapshot_from_raw(raw: dict) -> PricingSnapshot:
+    base_price = _decimal(raw.get("base_price"))
+    prices = {}
+    for variant in raw.get("variants") or []:
+        effective_price = variant.get("effective_price")
+        if effective_price is not None:
+            prices[variant["sku"]] = _decimal(effective_price)
+        else:
+            # Not backfilled yet
+            prices[variant["sku"]] = variant_price(base_price, _decimal(variant.get("price_adjustment")))
+    images = raw.get("images") or []
+    image = images[0] if images else None
+    renditions = raw.get("image_renditions") or []
+    if renditions and renditions[0].get("url") == image:
+        # Carts show the image small; use the thumbnail when there is one
+        thumbnail = (renditions[0].get("renditions") or {}).get("thumbnail")
+        if thumbnail:
+            image = thumbnail["url"]
+    return PricingSnapshot(
+        title=raw.get("title", ""),
+        image=image,
+        base_price=base_price,
+        prices=prices,
+    )
+
+async def get_pricing_snapshots(
+    product_ids: Iterable[PydanticObjectId],
+) -> Dict[PydanticObjectId, PricingSnapshot]:
+    """
+    Pricing snapshots for the given products, served from the short-lived
+    per-worker cache; misses are loaded in one projected $in query.
+    Products that no longer exist are left out of the result.
+    """
+    snapshots = {}
+    missing = []
+    for product_id in set(product_ids):
+        snapshot = product_pricing_cache.get(product_id)
+        if snapshot is None:
+            missing.append(product_id)
+        else:
+            snapshots[product_id] = snapshot
+
+    if missing:
+        generation = product_pricing_cache.generation
+        cursor = Product.get_motor_collection().find({"_id": {"$in": missing}}, PRICING_PROJECTION)
+        async for raw in cursor:
+            snapshot = snapshot_from_raw(raw)
+            product_id = PydanticObjectId(raw["_id"])
+            product_pricing_cache.set(product_id, snapshot, generation=generation)
+            snapshots[product_id] = snapshot
+
+    return snapshots
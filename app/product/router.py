@@ -1,33 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body, File, UploadFile
-from app.product.models import Product, ProductVariant
+from fastapi import APIRouter, Depends, HTTPException, status, Body, File, UploadFile, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.product.models import (
+    Product, ProductVariant, ProductSize, ProductCreate, ProductVariantCreate, price_variants,
+)
+from app.product.cache import (
+    product_detail_cache, product_list_cache, product_facets_cache,
+    invalidate_product, bump_catalog_version, catalog_etag,
+)
+from app.product.skus import find_variant, duplicate_sku
+from app.product.uploads import UploadRejected, UploadSizeLimitRoute, store_image, remove_upload
+from app.product.images import describe_images, renditions_for
+from app.product.bulk import NDJSON_MEDIA_TYPE, ImportResult, import_products, export_products
 from app.auth.dependencies import get_current_admin_user
+from app.core.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_after
+from app.core.conditional import not_modified
+from app.core.database import catalog_collection
+from app.core.responses import model_response
 from typing import List, Optional
 from pydantic import BaseModel
 from decimal import Decimal
 from beanie import PydanticObjectId
-import shutil
-import os
-import uuid
+from bson import Decimal128
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Schemas for Request/Response
-class ProductVariantCreate(BaseModel):
-    sku: str
-    size: str
-    color: str
-    stock_quantity: int
-    price_adjustment: Optional[Decimal] = Decimal("0.00")
-
-class ProductCreate(BaseModel):
-    title: str
-    description: str
-    base_price: Decimal
-    slug: str
-    variants: List[ProductVariantCreate] = []
-    images: List[str] = []
-    is_published: bool = True
-
 class ProductUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -36,45 +38,104 @@ class ProductUpdate(BaseModel):
     images: Optional[List[str]] = None
     is_published: Optional[bool] = None
 
+class CatalogFilter(BaseModel):
+    size: Optional[ProductSize] = None
+    color: Optional[str] = None
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+
+    def cache_key(self) -> tuple:
+        return (self.size, self.color, self.min_price, self.max_price)
+
+    def variant_match(self) -> dict:
+        # Conditions a single variant must satisfy together ("Black in M under $20")
+        match = {}
+        if self.size is not None:
+            match["size"] = self.size.value
+        if self.color is not None:
+            match["color"] = self.color
+        # Raw driver queries: BSON has no encoder for Decimal
+        price = {}
+        if self.min_price is not None:
+            price["$gte"] = Decimal128(self.min_price)
+        if self.max_price is not None:
+            price["$lte"] = Decimal128(self.max_price)
+        if price:
+            match["effective_price"] = price
+        return match
+
+    def product_query(self) -> dict:
+        query = {"is_published": True}
+        match = self.variant_match()
+        if match:
+            query["variants"] = {"$elemMatch": match}
+        return query
+
+def catalog_filter(
+    size: Optional[ProductSize] = None,
+    color: Optional[str] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+) -> CatalogFilter:
+    return CatalogFilter(size=size, color=color, min_price=min_price, max_price=max_price)
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class CatalogFacets(BaseModel):
+    total: int
+    sizes: List[FacetCount]
+    colors: List[FacetCount]
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+
+class ProductImages(BaseModel):
+    images: List[str] = []
+
+class SkuLookupResponse(BaseModel):
+    product_id: str
+    slug: str
+    title: str
+    variant: ProductVariant
+
+def _duplicate_key_error(e: DuplicateKeyError) -> HTTPException:
+    sku = duplicate_sku(e)
+    if sku is not None:
+        return HTTPException(status_code=400, detail=f"SKU {sku} is already used by another product")
+    return HTTPException(status_code=400, detail="Product slug already exists")
+
 # Routes
 
-@router.post("/upload")
 async def upload_image(file: UploadFile = File(...), admin = Depends(get_current_admin_user)):
     
     # Validate file type
-    MAX_FILE_SIZE = 5 * 1024 * 1024 # 5MB
     ALLOWED_TYPES = ["image/jpeg", "image/png", "image/webp"]
     
     if file.content_type not in ALLOWED_TYPES:
         raise HTTPException(status_code=400, detail="Invalid file type. Only JPEG, PNG, WEBP allowed.")
     
-    # Read first 1kb to validate header (Magic numbers)
-    # Simple check for now, can be expanded
-    
-    # Safe filename
     ext = file.filename.split(".")[-1].lower()
     if ext not in ["jpg", "jpeg", "png", "webp"]:
          raise HTTPException(status_code=400, detail="Invalid extension.")
-         
-    safe_filename = f"{uuid.uuid4()}.{ext}"
-    upload_dir = "app/static/uploads"
-    file_path = f"{upload_dir}/{safe_filename}"
-    
-    os.makedirs(upload_dir, exist_ok=True)
-    
+
+    # Size and magic bytes are checked while streaming; the stored name is the
+    # content hash, so uploading the same image twice returns the same URL
     try:
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-             raise HTTPException(status_code=400, detail="File too large (Max 5MB)")
-
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
-            
-    except Exception as e:
-        print(f"Upload error: {e}")
+        url = await store_image(file)
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        logger.exception("Upload failed")
         raise HTTPException(status_code=500, detail="File upload failed")
-        
-    return {"url": f"/static/uploads/{safe_filename}"}
+
+    # Resized copies for listings; the original is still usable if this fails
+    renditions = await renditions_for(url)
+    return {"url": url, "renditions": renditions}
+
+# Oversized uploads are refused from Content-Length, before the body is parsed
+router.add_api_route("/upload", upload_image, methods=["POST"], route_class_override=UploadSizeLimitRoute)
+
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED)
 async def create_product(product_in: ProductCreate, admin = Depends(get_current_admin_user)):
     existing_product = await Product.find_one(Product.slug == product_in.slug)
@@ -89,20 +150,175 @@ async def create_product(product_in: ProductCreate, admin = Depends(get_current_
     if not product_in.variants:
         raise HTTPException(status_code=400, detail="At least one variant is required")
 
-    product = Product(**product_in.dict())
-    await product.insert()
+    product = Product(
+        **product_in.dict(),
+        image_renditions=await describe_images(product_in.images),
+    )  # effective prices are derived on construction
+    try:
+        await product.insert()
+    except DuplicateKeyError as e:
+        raise _duplicate_key_error(e)
+    invalidate_product(product, listing_changed=product.is_published)
+    await bump_catalog_version()
     return product
 
 @router.get("/", response_model=List[Product])
-async def list_products(skip: int = 0, limit: int = 20):
-    return await Product.find(Product.is_published == True).skip(skip).limit(limit).to_list()
+async def list_products(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, description="Legacy offset paging; prefer `cursor`"),
+    limit: int = Query(20, ge=1, le=100),
+    catalog: CatalogFilter = Depends(catalog_filter),
+):
+    # Newest first, served from the (is_published, created_at, _id) index.
+    # With a cursor (or on the first page) Mongo seeks straight to the page;
+    # `skip` is kept for old clients but still walks every skipped document.
+    # Size/color/price filters use the multikey variant indexes instead.
+    # A bad cursor is a 400 whatever the client has cached
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Unchanged since the client's copy: answer before loading anything
+    cached_response = not_modified(request, response, await catalog_etag())
+    if cached_response:
+        return cached_response
+
+    cache_key = (cursor, skip, limit, catalog.cache_key())
+    page = product_list_cache.get(cache_key)
+    if page is None:
+        filters = [catalog.product_query()]
+        if position:
+            filters.append(keyset_after(*position))
+
+        generation = product_list_cache.generation
+        # May be served by a secondary (MONGO_CATALOG_READ_PREFERENCE)
+        raw_products = await catalog_collection(Product).find(
+            filters[0] if len(filters) == 1 else {"$and": filters},
+            sort=[("created_at", DESCENDING), ("_id", DESCENDING)],
+            skip=skip if not cursor else 0,
+            limit=limit,
+        ).to_list(limit)
+        products = [Product.model_validate(raw) for raw in raw_products]
+
+        next_cursor = None
+        if len(products) == limit:
+            next_cursor = encode_cursor(products[-1].created_at, products[-1].id)
+        page = (products, next_cursor)
+        product_list_cache.set(cache_key, page, generation=generation)
+
+    products, next_cursor = page
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return model_response(List[Product], products, response)
+
+@router.get("/facets", response_model=CatalogFacets)
+async def get_catalog_facets(
+    request: Request,
+    response: Response,
+    catalog: CatalogFilter = Depends(catalog_filter),
+):
+    # Counts for filter sidebars in a single aggregation: products matching the
+    # current filter, broken down by the sizes/colors of their matching variants.
+    cached_response = not_modified(request, response, await catalog_etag())
+    if cached_response:
+        return cached_response
+
+    cache_key = catalog.cache_key()
+    facets = product_facets_cache.get(cache_key)
+    if facets is not None:
+        return model_response(CatalogFacets, facets, response)
+
+    generation = product_facets_cache.generation
+    variant_match = {f"variants.{k}": v for k, v in catalog.variant_match().items()}
+    pipeline = [
+        {"$match": catalog.product_query()},
+        {"$unwind": "$variants"},
+        {"$match": variant_match},
+        {"$facet": {
+            "sizes": [
+                {"$group": {"_id": "$variants.size", "products": {"$addToSet": "$_id"}}},
+                {"$project": {"count": {"$size": "$products"}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "colors": [
+                {"$group": {"_id": "$variants.color", "products": {"$addToSet": "$_id"}}},
+                {"$project": {"count": {"$size": "$products"}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "summary": [
+                {"$group": {
+                    "_id": None,
+                    "products": {"$addToSet": "$_id"},
+                    "min_price": {"$min": "$variants.effective_price"},
+                    "max_price": {"$max": "$variants.effective_price"},
+                }},
+                {"$project": {"total": {"$size": "$products"}, "min_price": 1, "max_price": 1}},
+            ],
+        }},
+    ]
+    results = await catalog_collection(Product).aggregate(pipeline).to_list(None)
+    result = results[0] if results else {}
+    summary = (result.get("summary") or [{}])[0]
+
+    def to_decimal(value):
+        return value.to_decimal() if value is not None else None
+
+    facets = CatalogFacets(
+        total=summary.get("total", 0),
+        sizes=[FacetCount(value=f["_id"], count=f["count"]) for f in result.get("sizes", [])],
+        colors=[FacetCount(value=f["_id"], count=f["count"]) for f in result.get("colors", [])],
+        min_price=to_decimal(summary.get("min_price")),
+        max_price=to_decimal(summary.get("max_price")),
+    )
+    product_facets_cache.set(cache_key, facets, generation=generation)
+    return model_response(CatalogFacets, facets, response)
+
+@router.post("/import", response_model=ImportResult)
+async def import_catalog(request: Request, admin = Depends(get_current_admin_user)):
+    # The body is NDJSON (one ProductCreate per line), parsed as it arrives
+    return await import_products(request.stream())
+
+@router.get("/export")
+async def export_catalog(admin = Depends(get_current_admin_user)):
+    return StreamingResponse(
+        export_products(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="products.ndjson"'},
+    )
+
+@router.get("/by-sku/{sku}", response_model=SkuLookupResponse)
+async def get_product_by_sku(sku: str):
+    # For warehouse/cart integrations that only know the SKU. Returns just the
+    # matching variant, with live stock.
+    found = await find_variant(sku, published_only=True, slug=1, title=1)
+    if not found:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    raw, variant = found
+    return SkuLookupResponse(product_id=str(raw["_id"]), slug=raw["slug"], title=raw["title"], variant=variant)
 
 @router.get("/{slug}", response_model=Product)
-async def get_product(slug: str):
-    product = await Product.find_one(Product.slug == slug, Product.is_published == True)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+async def get_product(slug: str, request: Request, response: Response):
+    # The ETag covers the whole catalog, so resolve the slug first: an unknown
+    # or unpublished product is a 404 even for a client holding the current tag
+    etag = await catalog_etag()
+    product = product_detail_cache.get(slug)
+    if product is None:
+        generation = product_detail_cache.generation
+        raw = await catalog_collection(Product).find_one({"slug": slug, "is_published": True})
+        if not raw:
+            raise HTTPException(status_code=404, detail="Product not found")
+        product = Product.model_validate(raw)
+        product_detail_cache.set(slug, product, generation=generation)
+
+    cached_response = not_modified(request, response, etag)
+    if cached_response:
+        return cached_response
+    return model_response(Product, product, response)
 
 @router.put("/{product_id}", response_model=Product)
 async def update_product(
@@ -125,8 +341,32 @@ async def update_product(
     # For now, we trust the admin input or basic pydantic validation
     if product_in.variants is not None and len(product_in.variants) == 0:
         raise HTTPException(status_code=400, detail="Cannot remove all variants. Delete the product instead.")
+
+    # $set bypasses model validation, so keep the stored effective prices in sync
+    if "base_price" in update_data or "variants" in update_data:
+        base_price = update_data.get("base_price", product.base_price)
+        variants = product_in.variants if product_in.variants is not None else product.variants
+        update_data["variants"] = price_variants(base_price, variants)
     
-    await product.set(update_data)
+    if "images" in update_data:
+        update_data["image_renditions"] = await describe_images(update_data["images"])
+
+    if "variants" in update_data:
+        skus = [v.sku for v in update_data["variants"]]
+        if len(skus) != len(set(skus)):
+            raise HTTPException(status_code=400, detail="Duplicate SKUs in variants")
+
+    was_published = product.is_published
+    try:
+        await product.set(update_data)
+    except DuplicateKeyError as e:
+        raise _duplicate_key_error(e)
+    invalidate_product(
+        product,
+        listing_changed=product.is_published != was_published,
+        variants_changed="variants" in update_data,
+    )
+    await bump_catalog_version()
     return product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -144,18 +384,22 @@ async def delete_product(
         raise HTTPException(status_code=404, detail="Product not found")
 
     
-    # Delete associated images
+    # Delete associated images, unless another product uses the same
+    # (content-addressed) file
     if product.images:
+        shared = await Product.find(
+            {"_id": {"$ne": product.id}, "images": {"$in": product.images}}
+        ).project(ProductImages).to_list()
+        in_use = {url for other in shared for url in other.images}
         for image_url in product.images:
+            if image_url in in_use:
+                continue
             try:
-                # Remove '/static/uploads/' prefix to get filename
-                if image_url.startswith("/static/uploads/"):
-                    filename = image_url.replace("/static/uploads/", "")
-                    file_path = f"app/static/uploads/{filename}"
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
+                await remove_upload(image_url)
             except Exception as e:
                 print(f"Error deleting image {image_url}: {e}")
 
     await product.delete()
+    invalidate_product(product, listing_changed=product.is_published)
+    await bump_catalog_version()
     return None
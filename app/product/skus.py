@@ -0,0 +1,52 @@
+from typing import Optional, Tuple
+
+from beanie import PydanticObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.product.cache import sku_cache
+from app.product.models import Product, ProductVariant
+
+# Resolve a SKU to its product and variant. The sku -> product id map is
+# cached per worker; the variant itself is always read from Mongo with an
+# $elemMatch projection, so only the matching variant is returned and stock
+# levels are current.
+
+async def find_variant(
+    sku: str,
+    product_id: Optional[PydanticObjectId] = None,
+    published_only: bool = False,
+    **projection,
+) -> Optional[Tuple[dict, ProductVariant]]:
+    """
+    Look up `sku` and return (raw product fields, variant), or None.
+
+    With a known `product_id` this is a single _id lookup. Otherwise the
+    cached mapping is tried first and the unique variants.sku index is used
+    on a miss. Extra product fields can be requested as `field=1`.
+    """
+    query = {"variants.sku": sku}
+    if published_only:
+        query["is_published"] = True
+
+    cached = product_id is None and sku_cache.get(sku)
+    if product_id is not None or cached:
+        query["_id"] = product_id or cached
+
+    generation = sku_cache.generation
+    raw = await Product.get_motor_collection().find_one(query, {"variants": {"$elemMatch": {"sku": sku}}, **projection})
+    if raw is None and cached:
+        # The SKU moved to another product (or went away) since it was cached
+        sku_cache.invalidate(sku)
+        return await find_variant(sku, published_only=published_only, **projection)
+    if raw is None:
+        return None
+
+    sku_cache.set(sku, PydanticObjectId(raw["_id"]), generation=generation)
+    return raw, ProductVariant(**raw["variants"][0])
+
+def duplicate_sku(error: DuplicateKeyError) -> Optional[str]:
+    """The SKU behind a variants.sku unique violation, or None for other keys."""
+    details = error.details or {}
+    if "variants.sku" not in (details.get("keyPattern") or {}):
+        return None
+    return (details.get("keyValue") or {}).get("variants.sku")
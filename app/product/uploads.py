@@ -0,0 +1,164 @@
+import glob
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from app.core.config import get_settings
+from app.core.metrics import register_collector
+
+settings = get_settings()
+
+UPLOAD_DIR = "app/static/uploads"
+UPLOAD_URL_PREFIX = "/static/uploads/"
+CHUNK_SIZE = 64 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Leading bytes -> canonical extension; the client's content type and file
+# name are only hints
+def sniff_image_type(head: bytes) -> Optional[str]:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+class UploadRejected(ValueError):
+    pass
+
+class UploadStats:
+    def __init__(self):
+        self.stored = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.bytes_written = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "bytes_written": self.bytes_written,
+        }
+
+upload_stats = UploadStats()
+register_collector("uploads", upload_stats.as_dict)
+
+class UploadSizeLimitRoute(APIRoute):
+    """
+    Route class for upload endpoints. FastAPI reads and spools the whole
+    multipart body before the endpoint runs, so a declared Content-Length
+    over the limit is refused here, before anything is read. Chunked
+    uploads without one are still caught while the file is hashed.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request):
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > settings.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD:
+                upload_stats.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File too large (Max {settings.UPLOAD_MAX_BYTES // (1024 * 1024)}MB)",
+                )
+            return await handler(request)
+
+        return limited_handler
+
+def _hash_upload(source: BinaryIO, max_bytes: int) -> Tuple[str, str]:
+    # First pass over the spooled upload: validate and hash without writing
+    head = source.read(CHUNK_SIZE)
+    ext = sniff_image_type(head)
+    if ext is None:
+        raise UploadRejected("File is not a JPEG, PNG or WEBP image.")
+
+    digest = hashlib.sha256()
+    size = 0
+    chunk = head
+    while chunk:
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadRejected(f"File too large (Max {max_bytes // (1024 * 1024)}MB)")
+        digest.update(chunk)
+        chunk = source.read(CHUNK_SIZE)
+    return digest.hexdigest(), ext
+
+def _copy_upload(source: BinaryIO, path: str) -> int:
+    # Write to a temp file in the same directory and rename it into place, so
+    # a half-written image is never served under its final name
+    source.seek(0)
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := source.read(CHUNK_SIZE):
+                out.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return written
+
+def _store_upload(source: BinaryIO, max_bytes: int) -> str:
+    content_hash, ext = _hash_upload(source, max_bytes)
+    filename = f"{content_hash}.{ext}"
+    path = os.path.join(UPLOAD_DIR, filename)
+    if os.path.exists(path):
+        # Same bytes were uploaded before; nothing to write
+        upload_stats.deduplicated += 1
+        return filename
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_stats.bytes_written += _copy_upload(source, path)
+    upload_stats.stored += 1
+    return filename
+
+async def store_image(upload, max_bytes: Optional[int] = None) -> str:
+    """
+    Validate an uploaded image and store it under its SHA-256, returning the
+    public URL. All reading, hashing and writing happens in chunks on a
+    worker thread. Raises UploadRejected for oversized or non-image files.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    # The body is already spooled by now (see UploadSizeLimitRoute for the
+    # early check); this only saves hashing a file that is too large anyway
+    if upload.size is not None and upload.size > max_bytes:
+        upload_stats.rejected += 1
+        raise UploadRejected(f"File too large (Max {max_bytes // (1024 * 1024)}MB)")
+    try:
+        filename = await run_in_threadpool(_store_upload, upload.file, max_bytes)
+    except UploadRejected:
+        upload_stats.rejected += 1
+        raise
+    return UPLOAD_URL_PREFIX + filename
+
+def upload_path(url: str) -> Optional[str]:
+    """Local path of an uploaded image URL, or None for external URLs."""
+    if not url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    filename = os.path.basename(url[len(UPLOAD_URL_PREFIX):])
+    return os.path.join(UPLOAD_DIR, filename)
+
+async def remove_upload(url: str) -> None:
+    """Delete an uploaded image together with its renditions (<hash>.*)."""
+    path = upload_path(url)
+    if path is not None:
+        await run_in_threadpool(_remove_files, path)
+
+def _remove_files(path: str) -> None:
+    stem = os.path.splitext(path)[0]
+    for candidate in glob.glob(glob.escape(stem) + ".*"):
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,44 @@
+import asyncio
+from app.core.database import init_db
+from app.product.models import Product
+from app.product.cache import bump_catalog_version
+
+# Products written before variants carried effective_price don't match the
+# catalog price filter. This fills the field in server-side, in one update.
+BACKFILL_PIPELINE = [
+    {"$set": {
+        "variants": {
+            "$map": {
+                "input": "$variants",
+                "in": {
+                    "$mergeObjects": [
+                        "$$this",
+                        {"effective_price": {"$add": [
+                            {"$toDecimal": "$base_price"},
+                            {"$toDecimal": {"$ifNull": ["$$this.price_adjustment", 0]}},
+                        ]}},
+                    ]
+                },
+            }
+        }
+    }}
+]
+
+async def backfill_effective_prices() -> int:
+    result = await Product.get_motor_collection().update_many(
+        {"variants": {"$elemMatch": {"effective_price": {"$exists": False}}}},
+        BACKFILL_PIPELINE,
+    )
+    return result.modified_count
+
+async def main():
+    print("Initializing database connection...")
+    await init_db()
+    modified = await backfill_effective_prices()
+    if modified:
+        # Running API workers drop their cached catalog and ETags
+        await bump_catalog_version()
+    print(f"Backfilled effective prices on {modified} products.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,429 @@
+"""
+Throughput and latency percentiles of the main user flows, driven against
+the real app with the fake payment gateway.
+
+    python -m benchmarks.loadtest --mongod --scenario all --output report.json
+    python -m benchmarks.loadtest --scenario browse --users 50 --duration 30
+    python -m benchmarks.loadtest --mongod --baseline main.json   # exit 1 on regression
+
+Scenarios (each virtual user repeats one iteration until the time is up):
+  auth        register, log in, GET /auth/me
+  browse      listing pages with filters and cursors, facets, product
+              detail, revalidation with If-None-Match
+  cart        add, re-add, replace and remove cart lines
+  flash-sale  every user buys the same hot SKU until it sells out; the
+              report checks that nothing was oversold
+  mixed       mostly browsing, some cart churn, a few checkouts
+
+The app runs in-process (httpx ASGITransport) by default, so the numbers
+include routing, validation and MongoDB but no network. --base-url sends the
+same workload to a running server instead; start that one with
+PAYMENT_GATEWAY=fake, RATE_LIMIT_ENABLED=false and MONGO_URI pointing at the
+benchmark database.
+
+MongoDB: --mongod starts a throwaway single-node replica set from the
+`mongod` on PATH; otherwise --mongo-uri (default: MONGO_URI from .env) is
+used. Everything happens in the `tshirt_store_bench` database, which is
+dropped before each scenario. Checkout runs in a transaction, so the server
+must be a replica set.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId, init_beanie
+from httpx import ASGITransport, AsyncClient, Limits, Response
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import get_settings
+from app.core.database import DOCUMENT_MODELS
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.order.models import Order
+from app.product.cache import clear_product_caches
+from app.product.models import Product
+
+settings = get_settings()
+
+BENCH_DB = "tshirt_store_bench"
+SIZES = ("S", "M", "L")
+COLORS = ("Black", "White")
+PASSWORD = "Bench-pass-1"
+SHIPPING_ADDRESS = {
+    "full_name": "Bench User", "address_line_1": "1 Main St", "city": "Springfield",
+    "state": "IL", "zip_code": "62701", "country": "US",
+}
+# Endpoints with fewer samples are too noisy to compare against a baseline
+MIN_SAMPLES_TO_COMPARE = 20
+# p50/p99 increases below this are noise, whatever the percentage
+MIN_REGRESSION_MS = 1.0
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest rank
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class LatencyRecorder:
+    def __init__(self):
+        self.enabled = True
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+
+    def record(self, label: str, seconds: float, status, ok: bool) -> None:
+        if not self.enabled:
+            return
+        self.samples[label].append(seconds)
+        self.statuses[label][str(status)] += 1
+        if not ok:
+            self.errors[label] += 1
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label in sorted(self.samples):
+            timings = sorted(self.samples[label])
+            endpoints[label] = {
+                "requests": len(timings),
+                "errors": self.errors[label],
+                "rps": round(len(timings) / elapsed, 2),
+                "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+                "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+                "p90_ms": round(percentile(timings, 0.90) * 1000, 3),
+                "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+                "max_ms": round(timings[-1] * 1000, 3),
+                "statuses": dict(self.statuses[label]),
+            }
+        requests = sum(len(timings) for timings in self.samples.values())
+        return {
+            "duration_seconds": round(elapsed, 3),
+            "requests": requests,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+class Catalog:
+    def __init__(self, products: List[Product], hot: Product):
+        self.slugs = [p.slug for p in products]
+        self.variants = [(str(p.id), v.sku) for p in products for v in p.variants]
+        self.hot = (str(hot.id), hot.variants[0].sku)
+        self.hot_stock = hot.variants[0].stock_quantity
+
+class VirtualUser:
+    def __init__(self, client: AsyncClient, recorder: LatencyRecorder, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+        self.etags: Dict[str, str] = {}
+
+    async def call(self, method: str, path: str, label: str, expect=(200,), headers=None, **kwargs) -> Optional[Response]:
+        started_at = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers={**self.headers, **(headers or {})}, **kwargs)
+        except Exception:
+            # Connection errors when driving a real server
+            self.recorder.record(label, time.perf_counter() - started_at, "exception", ok=False)
+            return None
+        self.recorder.record(label, time.perf_counter() - started_at, response.status_code, response.status_code in expect)
+        return response
+
+    async def sign_up(self) -> bool:
+        email = f"bench-{uuid.uuid4().hex}@example.com"
+        await self.call("POST", "/auth/register", "POST /auth/register",
+                        json={"email": email, "password": PASSWORD, "full_name": "Bench User"})
+        response = await self.call("POST", "/auth/token", "POST /auth/token",
+                                   data={"username": email, "password": PASSWORD})
+        if response is None or response.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+# Scenarios: one iteration each; returning False retires the user
+
+async def auth_flow(user: VirtualUser, catalog: Catalog) -> bool:
+    if await user.sign_up():
+        await user.call("GET", "/auth/me", "GET /auth/me")
+    return True
+
+async def browse(user: VirtualUser, catalog: Catalog) -> bool:
+    rng = user.rng
+    params = {"limit": 20}
+    if rng.random() < 0.3:
+        params["size"] = rng.choice(SIZES)
+    if rng.random() < 0.2:
+        params["color"] = rng.choice(COLORS)
+    response = await user.call("GET", "/products/", "GET /products/", params=params)
+    cursor = response is not None and response.headers.get(NEXT_CURSOR_HEADER)
+    if cursor and rng.random() < 0.5:
+        await user.call("GET", "/products/", "GET /products/ (next page)", params={**params, "cursor": cursor})
+    if rng.random() < 0.3:
+        await user.call("GET", "/products/facets", "GET /products/facets")
+
+    # Pages seen before are revalidated, as a browser would
+    slug = rng.choice(catalog.slugs)
+    etag = user.etags.get(slug)
+    response = await user.call("GET", f"/products/{slug}", "GET /products/{slug}", expect=(200, 304),
+                               headers={"If-None-Match": etag} if etag else None)
+    if response is not None and response.status_code == 200 and "etag" in response.headers:
+        user.etags[slug] = response.headers["etag"]
+    return True
+
+async def cart_churn(user: VirtualUser, catalog: Catalog) -> bool:
+    picks = user.rng.sample(catalog.variants, 3)
+    for product_id, sku in picks + picks[:1]:
+        # The repeated first pick increments its existing line
+        await user.call("POST", "/cart/items", "POST /cart/items",
+                        json={"product_id": product_id, "variant_sku": sku, "quantity": 1})
+    await user.call("GET", "/cart/", "GET /cart/")
+    product_id, sku = picks[0]
+    await user.call("DELETE", f"/cart/items/{product_id}/{sku}", "DELETE /cart/items/{product_id}/{sku}")
+    await user.call("PUT", "/cart/items", "PUT /cart/items", json={"items": [
+        {"product_id": product_id, "variant_sku": sku, "quantity": 2} for product_id, sku in picks[1:]
+    ]})
+    await user.call("PUT", "/cart/items", "PUT /cart/items", json={"items": []})
+    return True
+
+async def checkout(user: VirtualUser, product_id: str, sku: str) -> Optional[int]:
+    """Buy one unit; returns the status that ended the attempt."""
+    response = await user.call("POST", "/cart/items", "POST /cart/items", expect=(200, 400),
+                               json={"product_id": product_id, "variant_sku": sku, "quantity": 1})
+    if response is None or response.status_code != 200:
+        return response and response.status_code
+    # 409: sold out between adding to the cart and checking out
+    response = await user.call("POST", "/orders/", "POST /orders/", expect=(201, 409),
+                               json={"shipping_address": SHIPPING_ADDRESS})
+    return response and response.status_code
+
+async def flash_sale(user: VirtualUser, catalog: Catalog) -> bool:
+    status = await checkout(user, *catalog.hot)
+    if status in (400, 409):
+        # Sold out; leave the cart empty for the next scenario's checks
+        await user.call("PUT", "/cart/items", "PUT /cart/items", json={"items": []})
+        return False
+    return True
+
+async def mixed(user: VirtualUser, catalog: Catalog) -> bool:
+    roll = user.rng.random()
+    if roll < 0.75:
+        return await browse(user, catalog)
+    if roll < 0.95:
+        return await cart_churn(user, catalog)
+    await checkout(user, *user.rng.choice(catalog.variants))
+    await user.call("GET", "/orders/", "GET /orders/", params={"summary": "true"})
+    return True
+
+SCENARIOS: Dict[str, Callable] = {
+    "auth": auth_flow,
+    "browse": browse,
+    "cart": cart_churn,
+    "flash-sale": flash_sale,
+    "mixed": mixed,
+}
+
+async def seed_catalog(product_count: int, hot_stock: int) -> Catalog:
+    await Product.get_motor_collection().database.client.drop_database(BENCH_DB)
+    await init_beanie(database=Product.get_motor_collection().database, document_models=DOCUMENT_MODELS)
+    clear_product_caches()
+
+    started = datetime.utcnow()
+    products = [
+        Product(
+            id=PydanticObjectId(),
+            title=f"Bench Tee {i}",
+            description="Heavyweight cotton tee with a relaxed fit. " * 4,
+            base_price=Decimal("19.90") + i % 5,
+            slug=f"bench-tee-{i}",
+            variants=[
+                {"sku": f"BENCH-{i}-{size}-{color}", "size": size, "color": color, "stock_quantity": 100_000}
+                for size in SIZES for color in COLORS
+            ],
+            created_at=started - timedelta(seconds=i),
+        )
+        for i in range(product_count)
+    ]
+    hot = Product(
+        id=PydanticObjectId(),
+        title="Limited Drop Tee",
+        description="One run only.",
+        base_price=Decimal("49.00"),
+        slug="bench-flash-tee",
+        variants=[{"sku": "BENCH-FLASH", "size": "M", "color": "Black", "stock_quantity": hot_stock}],
+        created_at=started,
+    )
+    await Product.insert_many(products + [hot])
+    return Catalog(products, hot)
+
+async def flash_sale_checks(catalog: Catalog) -> dict:
+    product_id, sku = catalog.hot
+    product = await Product.get(PydanticObjectId(product_id))
+    remaining = product.variant(sku).stock_quantity
+    sold = await Order.get_motor_collection().aggregate([
+        {"$unwind": "$items"},
+        {"$match": {"items.variant_sku": sku}},
+        {"$group": {"_id": None, "units": {"$sum": "$items.quantity"}}},
+    ]).to_list(None)
+    sold = sold[0]["units"] if sold else 0
+    return {
+        "hot_sku_stock": catalog.hot_stock,
+        "hot_sku_sold": sold,
+        "hot_sku_remaining": remaining,
+        "oversold": remaining < 0 or sold + remaining != catalog.hot_stock,
+    }
+
+async def drive(fn: Callable, users: List[VirtualUser], catalog: Catalog, duration: float) -> float:
+    deadline = time.perf_counter() + duration
+
+    async def loop(user: VirtualUser) -> None:
+        while time.perf_counter() < deadline:
+            if not await fn(user, catalog):
+                return
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(loop(user) for user in users))
+    return time.perf_counter() - started_at
+
+async def run_scenario(name: str, client: AsyncClient, args) -> dict:
+    catalog = await seed_catalog(args.products, args.flash_stock)
+    recorder = LatencyRecorder()
+    rng = random.Random(args.seed)
+    users = [VirtualUser(client, recorder, random.Random(rng.random())) for _ in range(args.users)]
+
+    if name != "auth":
+        # Signing up is the auth scenario's job; keep it out of this report
+        recorder.enabled = False
+        await asyncio.gather(*(user.sign_up() for user in users))
+
+    # The flash sale is over once the stock is gone, so it has no warmup
+    if args.warmup and name != "flash-sale":
+        recorder.enabled = False
+        await drive(SCENARIOS[name], users, catalog, args.warmup)
+
+    recorder.enabled = True
+    elapsed = await drive(SCENARIOS[name], users, catalog, args.duration)
+    report = recorder.report(elapsed)
+    report["checks"] = await flash_sale_checks(catalog) if name == "flash-sale" else {}
+    return report
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of `report` against an earlier report, as messages."""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {current['throughput_rps']} rps")
+        for label, stats in current["endpoints"].items():
+            old = before["endpoints"].get(label)
+            if not old or min(stats["requests"], old["requests"]) < MIN_SAMPLES_TO_COMPARE:
+                continue
+            if stats["errors"] and not old["errors"]:
+                regressions.append(f"{name} {label}: {stats['errors']} errors (baseline had none)")
+            for key in ("p50_ms", "p99_ms"):
+                if stats[key] > old[key] * (1 + tolerance) and stats[key] - old[key] >= MIN_REGRESSION_MS:
+                    regressions.append(f"{name} {label}: {key} {old[key]} -> {stats[key]}")
+    return regressions
+
+def print_report(report: dict) -> None:
+    for name, scenario in report["scenarios"].items():
+        print(f"\n{name}: {scenario['throughput_rps']} req/s, {scenario['requests']} requests, "
+              f"{scenario['errors']} errors in {scenario['duration_seconds']}s")
+        print(f"  {'endpoint':<42}{'reqs':>7}{'errs':>6}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for label, stats in scenario["endpoints"].items():
+            print(f"  {label:<42}{stats['requests']:>7}{stats['errors']:>6}{stats['p50_ms']:>9.2f}"
+                  f"{stats['p90_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['max_ms']:>9.2f}")
+        for check, value in scenario["checks"].items():
+            print(f"  {check}: {value}")
+
+@contextlib.asynccontextmanager
+async def bench_client(args):
+    limits = Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.base_url:
+        client = AsyncClient(base_url=args.base_url, limits=limits, timeout=30)
+    else:
+        from app.main import app
+        client = AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=30)
+    async with client:
+        yield client
+
+async def run(args, mongo_uri: str) -> int:
+    # Set before anything asks for the (cached) gateway
+    settings.PAYMENT_GATEWAY = "fake"
+    settings.FAKE_PAYMENT_LATENCY_SECONDS = args.gateway_latency_ms / 1000
+    # Every virtual user comes from the same address. The concurrency caps
+    # stay on; requests they shed count as errors in the report.
+    settings.RATE_LIMIT_ENABLED = False
+
+    motor_client = AsyncIOMotorClient(mongo_uri)
+    await init_beanie(database=motor_client[BENCH_DB], document_models=DOCUMENT_MODELS)
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    report = {
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "config": {
+            "users": args.users, "duration_seconds": args.duration, "warmup_seconds": args.warmup,
+            "products": args.products, "flash_stock": args.flash_stock,
+            "gateway_latency_ms": args.gateway_latency_ms, "seed": args.seed,
+            "transport": args.base_url or "asgi",
+        },
+        "scenarios": {},
+    }
+    async with bench_client(args) as client:
+        for name in names:
+            report["scenarios"][name] = await run_scenario(name, client, args)
+    motor_client.close()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = [name for name, scenario in report["scenarios"].items() if scenario["checks"].get("oversold")]
+    for name in failed:
+        print(f"\nFAIL {name}: stock invariant violated", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        failed += regressions
+    return 1 if failed else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the API and report latency percentiles")
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="mixed")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--flash-stock", type=int, default=100, help="Units of the hot SKU in the flash sale")
+    parser.add_argument("--gateway-latency-ms", type=float, default=0.0, help="Simulated payment gateway latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-uri", default=None, help="Defaults to MONGO_URI; must be a replica set")
+    parser.add_argument("--mongod", action="store_true", help="Start a throwaway mongod from PATH")
+    parser.add_argument("--base-url", default=None, help="Drive a running server instead of the in-process app")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a regression, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    if args.mongod:
+        from benchmarks.mongod import LocalMongod
+        with LocalMongod() as mongod:
+            return asyncio.run(run(args, mongod.uri))
+    return asyncio.run(run(args, args.mongo_uri or settings.MONGO_URI))
+
+if __name__ == "__main__":
+    sys.exit(main())
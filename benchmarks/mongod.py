@@ -0,0 +1,83 @@
+"""
+A throwaway MongoDB for benchmarks: a `mongod` from PATH started as a
+single-node replica set (checkout needs transactions) on a temp directory,
+removed again on exit.
+"""
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+REPLICA_SET = "bench"
+
+class LocalMongod:
+    def __init__(self, port: int = 27027, binary: str = "mongod", startup_timeout: float = 30.0):
+        self.port = port
+        self.binary = binary
+        self.startup_timeout = startup_timeout
+        self._process = None
+        self._dbpath = None
+
+    @property
+    def uri(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}/?replicaSet={REPLICA_SET}"
+
+    def __enter__(self) -> "LocalMongod":
+        executable = shutil.which(self.binary)
+        if executable is None:
+            raise RuntimeError(f"{self.binary} not found on PATH; pass --mongo-uri to use an existing server")
+        self._dbpath = tempfile.mkdtemp(prefix="bench-mongod-")
+        self._process = subprocess.Popen(
+            [executable, "--replSet", REPLICA_SET, "--port", str(self.port), "--dbpath", self._dbpath,
+             "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            self._initiate()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _initiate(self) -> None:
+        client = MongoClient("127.0.0.1", self.port, directConnection=True, serverSelectionTimeoutMS=500)
+        deadline = time.monotonic() + self.startup_timeout
+        initiated = False
+        try:
+            while True:
+                if self._process.poll() is not None:
+                    raise RuntimeError(f"mongod exited with {self._process.returncode}")
+                try:
+                    if not initiated:
+                        client.admin.command("replSetInitiate", {
+                            "_id": REPLICA_SET,
+                            "members": [{"_id": 0, "host": f"127.0.0.1:{self.port}"}],
+                        })
+                        initiated = True
+                    if client.admin.command("hello").get("isWritablePrimary"):
+                        return
+                except OperationFailure as e:
+                    # Already initiated (e.g. a retry after a slow start)
+                    initiated = initiated or e.code == 23
+                except PyMongoError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("mongod did not become primary in time")
+                time.sleep(0.2)
+        finally:
+            client.close()
+
+    def __exit__(self, *exc) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._dbpath is not None:
+            shutil.rmtree(self._dbpath, ignore_errors=True)
+            self._dbpath = None
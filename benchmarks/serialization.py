@@ -0,0 +1,121 @@
+"""
+Per-request serialization cost of catalog and order pages, before and after
+the lean response path.
+
+    python -m benchmarks.serialization [--requests 300]
+
+Needs the MongoDB from .env only to initialise Beanie; nothing is read or
+written. Documents are built in memory and served through in-process ASGI
+calls, so the numbers include FastAPI's routing but no network or DB time.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from beanie import PydanticObjectId
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.core.database import init_db
+from app.core.responses import model_response
+from app.order.models import Order
+from app.product.models import Product
+
+PAGE_SIZES = (20, 100)
+
+def make_products(count: int) -> List[Product]:
+    return [
+        Product.model_validate({
+            "_id": PydanticObjectId(),
+            "title": f"Classic Tee {i}",
+            "description": "Heavyweight cotton tee with a relaxed fit. " * 8,
+            "base_price": Decimal("24.90"),
+            "slug": f"classic-tee-{i}",
+            "images": [f"/static/uploads/{i:064x}.jpg", f"/static/uploads/{i + 1:064x}.jpg"],
+            "variants": [
+                {"sku": f"TEE-{i}-{size}-{color}", "size": size, "color": color,
+                 "stock_quantity": 40, "price_adjustment": Decimal("2.00") if size == "XL" else Decimal("0.00")}
+                for size in ("S", "M", "L", "XL") for color in ("Black", "White")
+            ],
+            "created_at": datetime(2024, 1, 1),
+        })
+        for i in range(count)
+    ]
+
+def make_orders(count: int) -> List[Order]:
+    user_id = PydanticObjectId()
+    return [
+        Order.model_validate({
+            "_id": PydanticObjectId(),
+            "user_id": user_id,
+            "items": [
+                {"product_id": PydanticObjectId(), "variant_sku": f"TEE-{j}-M-Black", "title": f"Classic Tee {j}",
+                 "size": "M", "color": "Black", "unit_price": Decimal("24.90"), "quantity": 1}
+                for j in range(3)
+            ],
+            "total_amount": Decimal("74.70"),
+            "shipping_address": {"full_name": "Jane Doe", "address_line_1": "1 Main St", "city": "Springfield",
+                                 "state": "IL", "zip_code": "62701", "country": "US"},
+            "created_at": datetime(2024, 1, 1),
+        })
+        for i in range(count)
+    ]
+
+def build_app(pages: dict) -> FastAPI:
+    app = FastAPI()
+    for name, (model, items) in pages.items():
+        def register(model=model, items=items, name=name):
+            @app.get(f"/{name}/before", response_model=List[model], response_class=JSONResponse)
+            async def before():
+                return items
+
+            @app.get(f"/{name}/orjson", response_model=List[model], response_class=ORJSONResponse)
+            async def orjson_only():
+                return items
+
+            @app.get(f"/{name}/after", response_model=List[model])
+            async def after():
+                return model_response(List[model], items)
+        register()
+    return app
+
+async def measure(client: AsyncClient, path: str, requests: int) -> float:
+    timings = []
+    for _ in range(requests):
+        started_at = time.perf_counter()
+        response = await client.get(path)
+        timings.append(time.perf_counter() - started_at)
+        response.raise_for_status()
+    return statistics.median(timings) * 1000
+
+async def run(requests: int) -> None:
+    pages = {}
+    for size in PAGE_SIZES:
+        pages[f"products-{size}"] = (Product, make_products(size))
+        pages[f"orders-{size}"] = (Order, make_orders(size))
+
+    app = build_app(pages)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        print(f"{'page':<14}{'before ms':>11}{'orjson ms':>11}{'after ms':>10}{'speedup':>9}")
+        for name in pages:
+            # Same JSON either way, just produced differently
+            assert (await client.get(f"/{name}/before")).json() == (await client.get(f"/{name}/after")).json()
+            before = await measure(client, f"/{name}/before", requests)
+            orjson_only = await measure(client, f"/{name}/orjson", requests)
+            after = await measure(client, f"/{name}/after", requests)
+            print(f"{name:<14}{before:>11.3f}{orjson_only:>11.3f}{after:>10.3f}{before / after:>8.1f}x")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    await init_db()
+    await run(args.requests)
+
+if __name__ == "__main__":
+    asyncio.run(main())
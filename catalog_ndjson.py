@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import sys
+from app.core.database import init_db
+from app.product.bulk import import_products, export_products
+
+# Bulk catalog load/dump in the same NDJSON format as
+# POST /products/import and GET /products/export:
+#
+#   python catalog_ndjson.py import summer.ndjson
+#   python catalog_ndjson.py export > catalog.ndjson
+
+CHUNK_SIZE = 64 * 1024
+
+async def read_chunks(path: str):
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+async def run_import(path: str) -> int:
+    result = await import_products(read_chunks(path))
+    for error in result.errors:
+        print(f"line {error.line}: {error.error}", file=sys.stderr)
+    if result.failed > len(result.errors):
+        print(f"... and {result.failed - len(result.errors)} more errors", file=sys.stderr)
+    print(f"Created {result.created}, updated {result.updated}, failed {result.failed}.", file=sys.stderr)
+    return 1 if result.failed else 0
+
+async def run_export(path: str) -> int:
+    out = sys.stdout.buffer if path == "-" else open(path, "wb")
+    count = 0
+    try:
+        async for line in export_products():
+            out.write(line)
+            count += 1
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"Exported {count} products.", file=sys.stderr)
+    return 0
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import or export the product catalog as NDJSON")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", nargs="?", default="-", help="File to read or write (default: stdin/stdout)")
+    args = parser.parse_args()
+
+    await init_db()
+    if args.command == "import":
+        return await run_import(args.path)
+    return await run_export(args.path)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -2,6 +2,7 @@ import asyncio
 from app.core.database import init_db
 from app.auth.models import User, UserRole
 from app.auth.security import get_password_hash
+from app.auth.dependencies import revoke_cached_principal
 
 async def create_admin():
     print("Initializing database connection...")
@@ -33,6 +34,8 @@ async def create_admin():
             print("Upgrading existing user to ADMIN.")
             user.role = UserRole.ADMIN
             await user.save()
+            # Running API workers cache principals; make them re-read this user
+            await revoke_cached_principal(user.email)
         return
 
     print("Creating new admin user...")
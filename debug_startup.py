@@ -1,23 +1,92 @@
-import sys
+"""
+Startup-time profiler: where a worker's boot time goes.
+
+    python debug_startup.py                  # import cost of app.main
+    python debug_startup.py --top 40 --module app.payment.router
+    python debug_startup.py --db             # also time init_db / warm-up against MONGO_URI
+
+Imports are measured with `python -X importtime` in a fresh interpreter, so
+nothing already imported here skews the numbers. Reported per module
+(self and cumulative, i.e. including what it imports) and per top-level
+package.
+"""
+import argparse
+import asyncio
 import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import List, NamedTuple
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+def profile_imports(module: str) -> List[ImportTiming]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    if result.returncode != 0:
+        # Import errors are what this script used to be for; show them as is
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us), depth))
+    return timings
+
+def report_imports(module: str, top: int) -> None:
+    timings = profile_imports(module)
+    total = next((t.cumulative_us for t in timings if t.module == module), sum(t.self_us for t in timings))
+    print(f"import {module}: {total / 1000:.0f} ms, {len(timings)} modules\n")
+
+    print("Slowest modules (cumulative includes the modules they import):")
+    print(f"  {'cumulative ms':>13}  {'self ms':>8}  module")
+    for timing in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+        print(f"  {timing.cumulative_us / 1000:>13.1f}  {timing.self_us / 1000:>8.1f}  {'  ' * min(timing.depth, 6)}{timing.module}")
+
+    packages = defaultdict(int)
+    for timing in timings:
+        packages[timing.module.split(".")[0]] += timing.self_us
+    print("\nBy top-level package (sum of self time):")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:>8.1f} ms  {package:<24} {self_us / total:>6.1%}")
+
+async def report_db() -> None:
+    sys.path.insert(0, os.getcwd())
+    from app.core.database import init_db, warm_up_db, close_db
+
+    for create_indexes in (False, True):
+        started_at = time.perf_counter()
+        await init_db(create_indexes=create_indexes)
+        attached = time.perf_counter()
+        await warm_up_db()
+        warmed = time.perf_counter()
+        close_db()
+        mode = "with index checks" if create_indexes else "attach only"
+        print(f"init_db ({mode}): {(attached - started_at) * 1000:.0f} ms, "
+              f"warm_up_db: {(warmed - attached) * 1000:.0f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profile worker startup")
+    parser.add_argument("--module", default="app.main", help="Module to import (default: app.main)")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--db", action="store_true", help="Also time database initialisation")
+    args = parser.parse_args()
+
+    report_imports(args.module, args.top)
+    if args.db:
+        print()
+        asyncio.run(report_db())
 
-# Add current directory to path
-sys.path.append(os.getcwd())
-
-print("Attempting to import app.order.router...")
-try:
-    from app.order.router import router
-    print("Import successful!")
-except Exception as e:
-    print(f"Import failed: {e}")
-    import traceback
-    traceback.print_exc()
-
-print("Attempting to import app.main...")
-try:
-    from app.main import app
-    print("Main app import successful!")
-except Exception as e:
-    print(f"Main app import failed: {e}")
-    import traceback
-    traceback.print_exc()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import sys
+from app.core.database import init_db, DOCUMENT_MODELS
+from app.core.migrations import plan_indexes, migrate_indexes
+
+# Creates and verifies MongoDB indexes. Run on every deploy, before workers
+# started with STARTUP_CREATE_INDEXES=false take traffic:
+#
+#   python migrate.py            # create missing/changed, drop obsolete
+#   python migrate.py --check    # report only; exits 1 if anything is pending
+
+def describe(plan) -> str:
+    parts = [f"{label}: {', '.join(names)}" for label, names in (
+        ("missing", plan.missing), ("changed", plan.changed),
+        ("obsolete", plan.obsolete), ("unknown", plan.unknown),
+    ) if names]
+    return "; ".join(parts) or "up to date"
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Create and verify MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="Only report, don't change anything")
+    parser.add_argument("--drop-unknown", action="store_true", help="Also drop indexes no model declares")
+    args = parser.parse_args()
+
+    await init_db(create_indexes=False)
+    pending = False
+    for model in DOCUMENT_MODELS:
+        if args.check:
+            plan = (await plan_indexes(model))[0]
+            pending = pending or not plan.up_to_date
+        else:
+            plan = await migrate_indexes(model, drop_unknown=args.drop_unknown)
+        print(f"{plan.collection}: {describe(plan)}")
+
+    if args.check and pending:
+        print("Indexes are out of date; run `python migrate.py`.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
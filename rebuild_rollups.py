@@ -0,0 +1,79 @@
+import asyncio
+from app.core.database import init_db
+from app.analytics.models import SalesRollup
+from app.analytics.rollups import COUNTED_STATUSES, REVERSED_STATUSES
+from app.order.models import Order, RollupState
+
+# Recomputes sales_rollups from scratch, e.g. after the rollup logic changed
+# or for orders placed before rollups existed. The running app maintains the
+# counters incrementally, so run this while no payments are being processed.
+
+INSERT_BATCH_SIZE = 1000
+
+# Same day bucketing as app.analytics.rollups.sales_day
+SALES_DAY = {"$dateTrunc": {"date": {"$ifNull": ["$paid_at", "$created_at"]}, "unit": "day"}}
+
+DAY_TOTALS_PIPELINE = [
+    {"$match": {"rollup_state": RollupState.COUNTED.value}},
+    {"$group": {
+        "_id": SALES_DAY,
+        "orders": {"$sum": 1},
+        "units": {"$sum": {"$sum": "$items.quantity"}},
+        "revenue": {"$sum": {"$toDecimal": "$total_amount"}},
+    }},
+    {"$project": {"_id": 0, "day": "$_id", "product_id": None, "variant_sku": None,
+                  "orders": 1, "units": 1, "revenue": 1}},
+]
+
+LINES_PIPELINE = [
+    {"$match": {"rollup_state": RollupState.COUNTED.value}},
+    {"$sort": {"created_at": 1}},
+    {"$unwind": "$items"},
+    {"$group": {
+        "_id": {"day": SALES_DAY, "product_id": "$items.product_id", "variant_sku": "$items.variant_sku"},
+        "title": {"$last": "$items.title"},
+        "orders": {"$sum": 1},
+        "units": {"$sum": "$items.quantity"},
+        "revenue": {"$sum": {"$multiply": [{"$toDecimal": "$items.unit_price"}, "$items.quantity"]}},
+    }},
+    {"$project": {"_id": 0, "day": "$_id.day", "product_id": "$_id.product_id",
+                  "variant_sku": "$_id.variant_sku", "title": 1, "orders": 1, "units": 1, "revenue": 1}},
+]
+
+async def _insert_from(pipeline) -> int:
+    rollups = SalesRollup.get_motor_collection()
+    inserted = 0
+    batch = []
+    async for row in Order.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            await rollups.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        await rollups.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+async def rebuild_sales_rollups() -> int:
+    orders = Order.get_motor_collection()
+    await orders.update_many(
+        {"status": {"$in": COUNTED_STATUSES}},
+        {"$set": {"rollup_state": RollupState.COUNTED.value}},
+    )
+    await orders.update_many(
+        {"status": {"$in": REVERSED_STATUSES}, "rollup_state": RollupState.COUNTED.value},
+        {"$set": {"rollup_state": RollupState.REVERSED.value}},
+    )
+
+    await SalesRollup.get_motor_collection().delete_many({})
+    return await _insert_from(DAY_TOTALS_PIPELINE) + await _insert_from(LINES_PIPELINE)
+
+async def main():
+    print("Initializing database connection...")
+    await init_db()
+    rows = await rebuild_sales_rollups()
+    print(f"Rebuilt {rows} sales rollup rows.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,17 +1,18 @@
 import pytest
 from httpx import AsyncClient, ASGITransport
 from app.main import app
-from app.core.database import init_db
+from app.core.database import init_db, DOCUMENT_MODELS
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
-from app.auth.models import User
-from app.product.models import Product
-from app.cart.models import Cart
-from app.order.models import Order
 from app.core.config import get_settings
 import asyncio
 
 settings = get_settings()
+# Never call out to Stripe from the test suite
+settings.PAYMENT_GATEWAY = "fake"
+# Every test client logs in from the same address; tests that exercise
+# the limiter turn it back on
+settings.RATE_LIMIT_ENABLED = False
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -30,12 +31,7 @@ async def test_db():
     
     await init_beanie(
         database=database,
-        document_models=[
-            User,
-            Product,
-            Cart,
-            Order
-        ]
+        document_models=DOCUMENT_MODELS
     )
     yield database
     # Cleanup after tests
@@ -0,0 +1,66 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from httpx import AsyncClient
+from beanie import PydanticObjectId
+from app.auth.models import UserRole
+from app.analytics.rollups import rollup_updates
+from app.order.models import Order, OrderItem
+from tests.utils import create_user_token
+
+def make_order(paid_at: datetime, *items) -> Order:
+    # Unsaved and without Beanie initialized; only the fields rollups read
+    return Order.model_construct(
+        user_id=PydanticObjectId(),
+        items=[
+            OrderItem(product_id=product_id, variant_sku=sku, title="Tee", size="M", color="Red",
+                      unit_price=Decimal(price), quantity=quantity)
+            for product_id, sku, price, quantity in items
+        ],
+        total_amount=sum(Decimal(price) * quantity for _, _, price, quantity in items),
+        paid_at=paid_at,
+        created_at=paid_at,
+    )
+
+def test_rollup_updates_adds_and_reverses_sales():
+    product_id = PydanticObjectId()
+    orders = [
+        make_order(datetime(2024, 5, 1, 9, 30), (product_id, "TEE-M", "10.00", 2)),
+        make_order(datetime(2024, 5, 1, 23, 59), (product_id, "TEE-M", "10.00", 1), (product_id, "TEE-L", "12.50", 1)),
+    ]
+
+    updates = {
+        (op._filter["product_id"], op._filter["variant_sku"]): op._doc
+        for op in rollup_updates(orders, 1)
+    }
+    day = datetime(2024, 5, 1)
+    assert all(op._filter["day"] == day for op in rollup_updates(orders, 1))
+
+    totals = updates[(None, None)]["$inc"]
+    assert (totals["orders"], totals["units"], totals["revenue"].to_decimal()) == (2, 4, Decimal("42.50"))
+    line = updates[(product_id, "TEE-M")]
+    assert (line["$inc"]["units"], line["$inc"]["revenue"].to_decimal()) == (3, Decimal("30.00"))
+    assert line["$set"] == {"title": "Tee"}
+
+    reversed_line = {
+        (op._filter["product_id"], op._filter["variant_sku"]): op._doc
+        for op in rollup_updates(orders[:1], -1)
+    }[(product_id, "TEE-M")]
+    assert reversed_line["$inc"]["units"] == -2
+    assert reversed_line["$inc"]["revenue"].to_decimal() == Decimal("-20.00")
+    assert "$set" not in reversed_line
+
+@pytest.mark.asyncio
+async def test_analytics_requires_admin(client: AsyncClient):
+    user_token = await create_user_token(client, UserRole.USER)
+    response = await client.get("/admin/analytics/daily", headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 403
+
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.get("/admin/analytics/daily", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == []
+
+    response = await client.get("/admin/analytics/products?start=2024-05-02&end=2024-05-01", headers=headers)
+    assert response.status_code == 400
@@ -68,3 +68,55 @@ async def test_login_wrong_password(client: AsyncClient):
         "password": "wrongpassword"
     })
     assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_principal_cache_revocation(client: AsyncClient):
+    from app.auth.dependencies import principal_cache, revoke_cached_principal
+    from app.auth.models import User
+
+    email = "cached@example.com"
+    password = "CachedPassword123"
+    await client.post("/auth/register", json={
+        "email": email,
+        "password": password,
+        "full_name": "Cached User"
+    })
+    token = (await client.post("/auth/token", data={
+        "username": email,
+        "password": password
+    })).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    await client.get("/auth/me", headers=headers)
+    hits = principal_cache.hits
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+    assert principal_cache.hits == hits + 1
+
+    # Deactivation is visible immediately once the principal is revoked
+    user = await User.find_one(User.email == email)
+    user.is_active = False
+    await user.save()
+    await revoke_cached_principal(email)
+    response = await client.get("/auth/me", headers=headers)
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_hash(client: AsyncClient):
+    from passlib.context import CryptContext
+    from app.auth.models import User
+    from app.auth.security import _hash_password_pre, pwd_context
+
+    email = "rehash@example.com"
+    password = "RehashPassword123"
+    weak_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    await User(
+        email=email,
+        password_hash=weak_context.hash(_hash_password_pre(password)),
+        full_name="Rehash User"
+    ).insert()
+
+    response = await client.post("/auth/token", data={"username": email, "password": password})
+    assert response.status_code == 200
+
+    user = await User.find_one(User.email == email)
+    assert not pwd_context.needs_update(user.password_hash)
@@ -0,0 +1,68 @@
+import time
+from beanie import PydanticObjectId
+from app.core.cache import TTLCache
+from app.product.cache import invalidate_product, product_list_cache
+from app.product.models import Product
+
+def test_cache_hit_and_miss():
+    cache = TTLCache("test_hit_miss", ttl_seconds=60, max_entries=10)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+def test_cache_lru_eviction():
+    cache = TTLCache("test_lru", ttl_seconds=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_expiry():
+    cache = TTLCache("test_expiry", ttl_seconds=0.01, max_entries=10)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_cache_invalidate_where():
+    cache = TTLCache("test_invalidate", ttl_seconds=60, max_entries=10)
+    cache.set(("page", 0), [1, 2])
+    cache.set(("page", 1), [3, 4])
+    cache.invalidate_where(lambda _, page: 3 in page)
+
+    assert cache.get(("page", 0)) == [1, 2]
+    assert cache.get(("page", 1)) is None
+
+def test_cache_skips_stale_generation():
+    cache = TTLCache("test_generation", ttl_seconds=60, max_entries=10)
+    generation = cache.generation
+    cache.invalidate("a")  # concurrent write while the value was being loaded
+    cache.set("a", "stale", generation=generation)
+    assert cache.get("a") is None
+
+def test_variant_change_drops_filtered_listings():
+    product = Product.model_construct(id=PydanticObjectId(), slug="new-match")
+    other = Product.model_construct(id=PydanticObjectId(), slug="other")
+    unfiltered = (None, 0, 20, (None, None, None, None))
+    filtered = (None, 0, 20, ("M", "Black", None, None))
+    product_list_cache.clear()
+
+    product_list_cache.set(unfiltered, ([other], None))
+    product_list_cache.set(filtered, ([other], None))
+    invalidate_product(product, listing_changed=False)
+    assert product_list_cache.get(filtered) is not None
+
+    # The product may now have a black M variant and belong on that page
+    invalidate_product(product, listing_changed=False, variants_changed=True)
+    assert product_list_cache.get(filtered) is None
+    assert product_list_cache.get(unfiltered) is not None
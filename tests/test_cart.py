@@ -1,6 +1,9 @@
 import pytest
 from httpx import AsyncClient
 from app.auth.models import UserRole
+from bson import Decimal128
+from decimal import Decimal
+from app.product.pricing import snapshot_from_raw
 from tests.utils import create_user_token, create_product
 
 @pytest.mark.asyncio
@@ -52,3 +55,59 @@ async def test_remove_from_cart(client: AsyncClient):
     response = await client.delete(f"/cart/items/{product['id']}/DEL-SKU", headers=headers)
     assert response.status_code == 200
     assert len(response.json()["items"]) == 0
+
+@pytest.mark.asyncio
+async def test_add_to_cart_exceeding_stock(client: AsyncClient):
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    user_token = await create_user_token(client, UserRole.USER)
+    product = await create_product(client, admin_token, sku="EXCEED-SKU")
+    headers = {"Authorization": f"Bearer {user_token}"}
+    payload = {"product_id": product["_id"], "variant_sku": "EXCEED-SKU", "quantity": 60}
+
+    assert (await client.post("/cart/items", json=payload, headers=headers)).status_code == 200
+    # 120 in total, only 100 in stock
+    response = await client.post("/cart/items", json=payload, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Total quantity exceeds stock"
+
+@pytest.mark.asyncio
+async def test_set_cart_items(client: AsyncClient):
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    user_token = await create_user_token(client, UserRole.USER)
+    first = await create_product(client, admin_token, sku="SYNC-1")
+    second = await create_product(client, admin_token, sku="SYNC-2")
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    await client.post("/cart/items", json={
+        "product_id": first["_id"], "variant_sku": "SYNC-1", "quantity": 1
+    }, headers=headers)
+
+    response = await client.put("/cart/items", json={"items": [
+        {"product_id": first["_id"], "variant_sku": "SYNC-1", "quantity": 3},
+        {"product_id": second["_id"], "variant_sku": "SYNC-2", "quantity": 2}
+    ]}, headers=headers)
+    assert response.status_code == 200
+    quantities = {i["variant_sku"]: i["quantity"] for i in response.json()["items"]}
+    assert quantities == {"SYNC-1": 3, "SYNC-2": 2}
+
+    # An empty list clears the cart
+    response = await client.put("/cart/items", json={"items": []}, headers=headers)
+    assert response.json()["items"] == []
+
+def test_pricing_snapshot_from_projection():
+    snapshot = snapshot_from_raw({
+        "title": "Tee",
+        "base_price": Decimal128("20.00"),
+        "images": ["front.png"],
+        "variants": [
+            {"sku": "TEE-M", "price_adjustment": Decimal128("0.00"), "effective_price": Decimal128("20.00")},
+            # Written before effective_price existed
+            {"sku": "TEE-XL", "price_adjustment": Decimal128("2.50")},
+        ],
+    })
+    assert snapshot.title == "Tee"
+    assert snapshot.image == "front.png"
+    assert snapshot.price_for("TEE-M") == Decimal("20.00")
+    assert snapshot.price_for("TEE-XL") == Decimal("22.50")
+    # A variant that no longer exists is priced at the base price
+    assert snapshot.price_for("GONE") == Decimal("20.00")
@@ -0,0 +1,26 @@
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from app.core.config import get_settings
+from app.core.database import catalog_read_preference, mongo_client_options
+
+settings = get_settings()
+
+def test_client_options_only_include_configured_values(monkeypatch):
+    monkeypatch.setattr(settings, "MONGO_MAX_POOL_SIZE", 50)
+    monkeypatch.setattr(settings, "MONGO_COMPRESSORS", "zstd,zlib")
+    monkeypatch.setattr(settings, "MONGO_MIN_POOL_SIZE", None)
+
+    options = mongo_client_options()
+    assert options["maxPoolSize"] == 50
+    assert options["compressors"] == "zstd,zlib"
+    # Left to MONGO_URI / the driver
+    assert "minPoolSize" not in options
+    assert options["event_listeners"]
+
+def test_catalog_read_preference(monkeypatch):
+    assert isinstance(catalog_read_preference(), Primary)
+
+    monkeypatch.setattr(settings, "MONGO_CATALOG_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(settings, "MONGO_CATALOG_MAX_STALENESS_SECONDS", 120)
+    preference = catalog_read_preference()
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == 120
@@ -0,0 +1,45 @@
+import pytest
+from types import SimpleNamespace
+from httpx import AsyncClient
+from app.core.metrics import Counter, Histogram, render_prometheus
+from app.core.instrumentation import CommandTimer, mongo_command_duration, mongo_command_failures
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, ("/a",))
+    counter = Counter("test_events_total", "Test events", ("kind",))
+    counter.inc(('say "hi"',), 2)
+
+    text = render_prometheus()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 3' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{route="/a"} 4' in text
+    assert 'test_latency_seconds_sum{route="/a"} 3.65' in text
+    assert 'test_events_total{kind="say \\"hi\\""} 2' in text
+
+def test_command_timer_labels_by_collection():
+    timer = CommandTimer()
+    started = SimpleNamespace(command={"find": "metrics_products", "filter": {}}, command_name="find",
+                              connection_id=("localhost", 27017), request_id=7)
+    timer.started(started)
+    timer.succeeded(SimpleNamespace(command_name="find", connection_id=started.connection_id, request_id=7,
+                                    duration_micros=1500))
+    timer.started(SimpleNamespace(command={"getMore": 123, "collection": "metrics_products"}, command_name="getMore",
+                                  connection_id=started.connection_id, request_id=8))
+    timer.failed(SimpleNamespace(command_name="getMore", connection_id=started.connection_id, request_id=8,
+                                 duration_micros=500))
+
+    assert mongo_command_duration._series[("find", "metrics_products")][-1] == pytest.approx(0.0015)
+    assert mongo_command_failures._values[("getMore", "metrics_products")] == 1
+    assert not timer._collections
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_templates(client: AsyncClient):
+    await client.get("/products/no-such-product")
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_requests_total{method="GET",route="/products/{slug}",status="404"}' in response.text
@@ -43,3 +43,241 @@ async def test_list_orders(client: AsyncClient):
     response = await client.get("/orders/", headers=headers)
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+@pytest.mark.asyncio
+async def test_create_order_insufficient_stock(client: AsyncClient):
+    from app.product.models import Product
+    from beanie import PydanticObjectId
+
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    user_token = await create_user_token(client, UserRole.USER)
+    product = await create_product(client, admin_token, sku="LOW-STOCK-SKU")
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    await client.post("/cart/items", json={
+        "product_id": product["_id"],
+        "variant_sku": "LOW-STOCK-SKU",
+        "quantity": 5
+    }, headers=headers)
+
+    # Stock drops below the cart quantity before checkout
+    await Product.get_motor_collection().update_one(
+        {"_id": PydanticObjectId(product["_id"])},
+        {"$set": {"variants.0.stock_quantity": 2}}
+    )
+
+    response = await client.post("/orders/", json={
+        "shipping_address": {
+            "full_name": "Buyer",
+            "address_line_1": "123 St",
+            "city": "City",
+            "state": "NY",
+            "zip_code": "10001",
+            "country": "US"
+        }
+    }, headers=headers)
+    assert response.status_code == 409
+    assert response.json()["detail"].startswith("Insufficient stock for Test Product")
+
+@pytest.mark.asyncio
+async def test_create_order_when_gateway_unavailable(client: AsyncClient):
+    from app.payment.gateway import get_payment_gateway
+
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    user_token = await create_user_token(client, UserRole.USER)
+    product = await create_product(client, admin_token, sku="OUTBOX-SKU")
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    await client.post("/cart/items", json={
+        "product_id": product["_id"],
+        "variant_sku": "OUTBOX-SKU",
+        "quantity": 1
+    }, headers=headers)
+
+    get_payment_gateway().fail_next = 1
+    response = await client.post("/orders/", json={
+        "shipping_address": {
+            "full_name": "Buyer",
+            "address_line_1": "123 St",
+            "city": "City",
+            "state": "NY",
+            "zip_code": "10001",
+            "country": "US"
+        }
+    }, headers=headers)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["client_secret"] is None
+
+    # The intent is attached on demand once the gateway is back
+    order_id = data["order"]["_id"]
+    response = await client.get(f"/orders/{order_id}/payment", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["client_secret"]
+
+@pytest.mark.asyncio
+async def test_intent_not_attached_to_cancelled_order(client: AsyncClient):
+    from datetime import datetime, timedelta
+    from beanie import PydanticObjectId
+    from app.order.models import Order, OrderItem, OrderStatus, ShippingAddress
+    from app.payment.gateway import get_payment_gateway
+    from app.payment.outbox import attach_payment_intent
+
+    # Swept while the dispatcher was creating its intent
+    order = Order(
+        user_id=PydanticObjectId(),
+        status=OrderStatus.CANCELLED,
+        items=[OrderItem(
+            product_id=PydanticObjectId(), variant_sku="GONE-SKU", title="Test Product",
+            size="M", color="Red", unit_price=10.0, quantity=1
+        )],
+        total_amount=10.0,
+        shipping_address=ShippingAddress(
+            full_name="Buyer", address_line_1="1 St", city="City", state="NY", zip_code="10001", country="US"
+        ),
+        created_at=datetime.utcnow() - timedelta(hours=1)
+    )
+    await order.insert()
+
+    assert await attach_payment_intent(order) is None
+    assert (await Order.get(order.id)).payment_intent_id is None
+    intents = [i for i in get_payment_gateway().intents.values() if i.metadata.get("order_id") == str(order.id)]
+    assert [i.status for i in intents] == ["canceled"]
+
+@pytest.mark.asyncio
+async def test_stock_race_names_the_short_sku(client: AsyncClient):
+    from beanie import PydanticObjectId
+    from app.order.router import _insufficient_stock, _short_variant
+
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    product = await create_product(client, admin_token, sku="RACE-SKU")
+    product_id = PydanticObjectId(product["_id"])
+
+    # What a concurrent checkout leaves behind when it commits first
+    assert await _short_variant({(product_id, "RACE-SKU"): 100}) is None
+    found = await _short_variant({(product_id, "RACE-SKU"): 101})
+    assert found is not None
+    error = _insufficient_stock(*found)
+    assert error.status_code == 409
+    assert error.detail == "Insufficient stock for Test Product (M/Red): 100 of RACE-SKU available"
+
+@pytest.mark.asyncio
+async def test_expired_reservation_is_released(client: AsyncClient):
+    from datetime import datetime, timedelta
+    from beanie import PydanticObjectId
+    from app.order.models import Order, OrderItem, OrderStatus, ShippingAddress
+    from app.order.sweeper import release_expired_reservations
+    from app.product.models import Product
+
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    product = await create_product(client, admin_token, sku="EXPIRE-SKU")
+    product_id = PydanticObjectId(product["_id"])
+
+    order = Order(
+        user_id=PydanticObjectId(),
+        items=[OrderItem(
+            product_id=product_id, variant_sku="EXPIRE-SKU", title="Test Product",
+            size="M", color="Red", unit_price=10.0, quantity=4
+        )],
+        total_amount=40.0,
+        shipping_address=ShippingAddress(
+            full_name="Buyer", address_line_1="1 St", city="City", state="NY", zip_code="10001", country="US"
+        ),
+        created_at=datetime.utcnow() - timedelta(days=1)
+    )
+    await order.insert()
+
+    await release_expired_reservations()
+
+    assert (await Order.get(order.id)).status == OrderStatus.CANCELLED
+    variant = (await Product.get(product_id)).variants[0]
+    assert variant.stock_quantity == 104
+
+@pytest.mark.asyncio
+async def test_sweeper_recovers_from_interrupted_release(client: AsyncClient):
+    from datetime import datetime, timedelta
+    from beanie import PydanticObjectId
+    from app.order.models import Order, OrderItem, OrderStatus, ShippingAddress
+    from app.order.sweeper import cancel_and_release, release_expired_reservations
+    from app.payment.gateway import get_payment_gateway
+    from app.product.models import Product
+
+    admin_token = await create_user_token(client, UserRole.ADMIN)
+    product = await create_product(client, admin_token, sku="RECOVER-SKU")
+    product_id = PydanticObjectId(product["_id"])
+    gateway = get_payment_gateway()
+
+    async def expired_order(quantity: int) -> Order:
+        intent = await gateway.create_intent(quantity * 1000, "usd", {}, idempotency_key=str(PydanticObjectId()))
+        order = Order(
+            user_id=PydanticObjectId(),
+            items=[OrderItem(
+                product_id=product_id, variant_sku="RECOVER-SKU", title="Test Product",
+                size="M", color="Red", unit_price=10.0, quantity=quantity
+            )],
+            total_amount=quantity * 10.0,
+            shipping_address=ShippingAddress(
+                full_name="Buyer", address_line_1="1 St", city="City", state="NY", zip_code="10001", country="US"
+            ),
+            payment_intent_id=intent.id,
+            created_at=datetime.utcnow() - timedelta(days=1)
+        )
+        await order.insert()
+        return order
+
+    abandoned = await expired_order(3)
+    paid = await expired_order(5)
+    # A previous sweep voided both intents, then the second order was paid
+    # before the release ran: only the first is released
+    await gateway.cancel_intent(abandoned.payment_intent_id)
+    await gateway.cancel_intent(paid.payment_intent_id)
+    await paid.set({Order.status: OrderStatus.PAID})
+    assert await cancel_and_release([abandoned, paid]) == 1
+    assert (await Order.get(paid.id)).status == OrderStatus.PAID
+    assert (await Product.get(product_id)).variants[0].stock_quantity == 103
+
+    # A sweep that died between voiding and releasing: cancelling again
+    # fails, but the intent is already canceled, so the stock still comes back
+    crashed = await expired_order(2)
+    await gateway.cancel_intent(crashed.payment_intent_id)
+    await release_expired_reservations()
+    assert (await Order.get(crashed.id)).status == OrderStatus.CANCELLED
+    assert (await Product.get(product_id)).variants[0].stock_quantity == 105
+
+@pytest.mark.asyncio
+async def test_order_history_pagination_and_detail(client: AsyncClient):
+    from datetime import datetime, timedelta
+    from decimal import Decimal
+    from beanie import PydanticObjectId
+    from app.order.models import Order
+
+    user_token = await create_user_token(client, UserRole.USER)
+    headers = {"Authorization": f"Bearer {user_token}"}
+    user_id = PydanticObjectId((await client.get("/auth/me", headers=headers)).json()["id"])
+
+    address = {"full_name": "Buyer", "address_line_1": "123 St", "city": "City",
+               "state": "NY", "zip_code": "10001", "country": "US"}
+    item = {"product_id": PydanticObjectId(), "variant_sku": "HIST-M", "title": "Tee",
+            "size": "M", "color": "Red", "unit_price": Decimal("10.00"), "quantity": 1}
+    start = datetime(2024, 1, 1)
+    for i in range(5):
+        await Order(user_id=user_id, items=[item] * (i + 1), total_amount=Decimal("10.00") * (i + 1),
+                    shipping_address=address, created_at=start + timedelta(hours=i)).insert()
+
+    first = await client.get("/orders/", params={"limit": 3, "summary": True}, headers=headers)
+    assert first.status_code == 200
+    assert [o["item_count"] for o in first.json()] == [5, 4, 3]
+    assert "items" not in first.json()[0]
+
+    second = await client.get("/orders/", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]}, headers=headers)
+    assert [len(o["items"]) for o in second.json()] == [2, 1]
+    assert "X-Next-Cursor" not in second.headers
+
+    order_id = first.json()[0]["_id"]
+    response = await client.get(f"/orders/{order_id}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 5
+
+    # Someone else's order is not found
+    other_headers = {"Authorization": f"Bearer {await create_user_token(client, UserRole.USER)}"}
+    assert (await client.get(f"/orders/{order_id}", headers=other_headers)).status_code == 404
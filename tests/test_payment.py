@@ -0,0 +1,63 @@
+import hashlib
+import hmac
+import json
+import time
+import pytest
+from httpx import AsyncClient
+from beanie import PydanticObjectId
+from app.core.config import get_settings
+from app.order.models import Order, OrderStatus, ShippingAddress
+from app.payment.models import PaymentEvent
+from app.payment.consumer import process_payment_events
+
+settings = get_settings()
+
+def signed_headers(payload: bytes) -> dict:
+    timestamp = int(time.time())
+    signature = hmac.new(
+        settings.STRIPE_WEBHOOK_SECRET.encode(),
+        f"{timestamp}.".encode() + payload,
+        hashlib.sha256
+    ).hexdigest()
+    return {"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"}
+
+async def create_pending_order() -> Order:
+    order = Order(
+        user_id=PydanticObjectId(),
+        total_amount=10.0,
+        shipping_address=ShippingAddress(
+            full_name="Buyer", address_line_1="1 St", city="City", state="NY", zip_code="10001", country="US"
+        )
+    )
+    await order.insert()
+    return order
+
+@pytest.mark.asyncio
+async def test_webhook_is_idempotent_and_marks_order_paid(client: AsyncClient):
+    order = await create_pending_order()
+    event_id = f"evt_{order.id}"
+    payload = json.dumps({
+        "id": event_id,
+        "object": "event",
+        "type": "payment_intent.succeeded",
+        "data": {"object": {"id": "pi_test", "object": "payment_intent", "metadata": {"order_id": str(order.id)}}}
+    }).encode()
+
+    # Stripe retries deliver the same event more than once
+    for _ in range(2):
+        response = await client.post("/stripe/webhook", content=payload, headers=signed_headers(payload))
+        assert response.status_code == 200
+
+    assert await PaymentEvent.find(PaymentEvent.event_id == event_id).count() == 1
+
+    await process_payment_events()
+    assert (await Order.get(order.id)).status == OrderStatus.PAID
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_bad_signature(client: AsyncClient):
+    response = await client.post(
+        "/stripe/webhook",
+        content=b"{}",
+        headers={"Stripe-Signature": "t=1,v1=bad", "Content-Type": "application/json"}
+    )
+    assert response.status_code == 400
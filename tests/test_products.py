@@ -98,3 +98,263 @@ async def test_get_product(client: AsyncClient, admin_token: str):
 async def test_get_product_not_found(client: AsyncClient):
     response = await client.get("/products/non-existent")
     assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_list_products_cursor_pagination(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    for i in range(3):
+        await client.post("/products/", json={
+            "title": f"Page {i}", "description": "D", "base_price": 10.0, "slug": f"page-{i}",
+            "variants": [{"sku": f"PAGE-{i}", "size": "M", "color": "Black", "stock_quantity": 1}]
+        }, headers=headers)
+
+    first = await client.get("/products/", params={"limit": 2})
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = await client.get("/products/", params={"limit": 2, "cursor": cursor})
+    assert second.status_code == 200
+    first_ids = {p["_id"] for p in first.json()}
+    assert not first_ids & {p["_id"] for p in second.json()}
+
+@pytest.mark.asyncio
+async def test_list_products_invalid_cursor(client: AsyncClient):
+    response = await client.get("/products/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_products_filtered_by_variant(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await client.post("/products/", json={
+        "title": "Facet", "description": "D", "base_price": 20.0, "slug": "facet-shirt",
+        "variants": [
+            {"sku": "FACET-S-RED", "size": "S", "color": "Red", "stock_quantity": 5},
+            {"sku": "FACET-L-BLUE", "size": "L", "color": "Blue", "stock_quantity": 5, "price_adjustment": 5.0}
+        ]
+    }, headers=headers)
+
+    response = await client.get("/products/", params={"size": "L", "color": "Blue", "min_price": 25})
+    assert response.status_code == 200
+    assert "facet-shirt" in [p["slug"] for p in response.json()]
+
+    # Size and color exist, but never on the same variant
+    response = await client.get("/products/", params={"size": "S", "color": "Blue"})
+    assert "facet-shirt" not in [p["slug"] for p in response.json()]
+
+@pytest.mark.asyncio
+async def test_list_products_filtered_by_price(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await client.post("/products/", json={
+        "title": "Priced", "description": "D", "base_price": 40.0, "slug": "priced-shirt",
+        "variants": [{"sku": "PRICED-M", "size": "M", "color": "Grey", "stock_quantity": 5, "price_adjustment": 2.5}]
+    }, headers=headers)
+
+    response = await client.get("/products/", params={"min_price": "42.50", "max_price": 43})
+    assert response.status_code == 200
+    assert "priced-shirt" in [p["slug"] for p in response.json()]
+
+    response = await client.get("/products/", params={"min_price": "42.51"})
+    assert response.status_code == 200
+    assert "priced-shirt" not in [p["slug"] for p in response.json()]
+
+@pytest.mark.asyncio
+async def test_catalog_facets(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await client.post("/products/", json={
+        "title": "Facet Count", "description": "D", "base_price": 15.0, "slug": "facet-count",
+        "variants": [{"sku": "FACET-COUNT-XS", "size": "XS", "color": "Mauve", "stock_quantity": 5}]
+    }, headers=headers)
+
+    response = await client.get("/products/facets", params={"color": "Mauve"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] >= 1
+    assert {"value": "XS", "count": data["total"]} in data["sizes"]
+
+@pytest.mark.asyncio
+async def test_catalog_facets_filtered_by_price(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await client.post("/products/", json={
+        "title": "Facet Price", "description": "D", "base_price": 30.0, "slug": "facet-price",
+        "variants": [
+            {"sku": "FACET-PRICE-S", "size": "S", "color": "Ochre", "stock_quantity": 5},
+            {"sku": "FACET-PRICE-XL", "size": "XL", "color": "Ochre", "stock_quantity": 5, "price_adjustment": 10.0}
+        ]
+    }, headers=headers)
+
+    response = await client.get("/products/facets", params={"color": "Ochre", "min_price": 35})
+    assert response.status_code == 200
+    data = response.json()
+    # Only the variant in range counts
+    assert data["total"] == 1
+    assert data["sizes"] == [{"value": "XL", "count": 1}]
+    assert Decimal(str(data["min_price"])) == Decimal("40")
+
+@pytest.mark.asyncio
+async def test_sku_is_unique_and_resolvable(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    payload = {
+        "title": "By SKU", "description": "D", "base_price": 12.0, "slug": "by-sku-shirt",
+        "variants": [
+            {"sku": "LOOKUP-M", "size": "M", "color": "Green", "stock_quantity": 4},
+            {"sku": "LOOKUP-L", "size": "L", "color": "Green", "stock_quantity": 2}
+        ]
+    }
+    created = (await client.post("/products/", json=payload, headers=headers)).json()
+
+    response = await client.get("/products/by-sku/LOOKUP-L")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["product_id"] == created["_id"]
+    assert data["variant"]["sku"] == "LOOKUP-L"
+    assert data["variant"]["stock_quantity"] == 2
+
+    # The same SKU on another product is rejected
+    response = await client.post("/products/", json={**payload, "slug": "by-sku-copy"}, headers=headers)
+    assert response.status_code == 400
+    assert "LOOKUP-M" in response.json()["detail"] or "LOOKUP-L" in response.json()["detail"]
+
+    assert (await client.get("/products/by-sku/NO-SUCH-SKU")).status_code == 404
+
+def test_duplicate_sku_from_key_error():
+    from pymongo.errors import DuplicateKeyError
+    from app.product.skus import duplicate_sku
+
+    sku_error = DuplicateKeyError("E11000", 11000, {
+        "keyPattern": {"variants.sku": 1}, "keyValue": {"variants.sku": "TS-BLK-M"}
+    })
+    slug_error = DuplicateKeyError("E11000", 11000, {
+        "keyPattern": {"slug": 1}, "keyValue": {"slug": "tee"}
+    })
+    assert duplicate_sku(sku_error) == "TS-BLK-M"
+    assert duplicate_sku(slug_error) is None
+
+@pytest.mark.asyncio
+async def test_upload_image_deduplicates_by_content(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 1024
+
+    first = await client.post("/products/upload", files={"file": ("a.png", png, "image/png")}, headers=headers)
+    second = await client.post("/products/upload", files={"file": ("b.png", png, "image/png")}, headers=headers)
+    assert first.status_code == 200
+    assert first.json()["url"] == second.json()["url"]
+
+    # Right content type and extension, wrong bytes
+    response = await client.post(
+        "/products/upload", files={"file": ("c.png", b"GIF89a" + b"\x00" * 64, "image/png")}, headers=headers
+    )
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_upload_rejected_from_content_length(client: AsyncClient, admin_token: str, monkeypatch):
+    from app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "UPLOAD_MAX_BYTES", 1024)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * (200 * 1024)
+
+    response = await client.post("/products/upload", files={"file": ("big.png", png, "image/png")}, headers=headers)
+    assert response.status_code == 413
+
+def test_sniff_image_type():
+    from app.product.uploads import sniff_image_type
+
+    assert sniff_image_type(b"\xff\xd8\xff\xe0rest") == "jpg"
+    assert sniff_image_type(b"\x89PNG\r\n\x1a\nrest") == "png"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert sniff_image_type(b"<svg xmlns=") is None
+
+def test_render_image_renditions(tmp_path):
+    from PIL import Image
+    from app.product.images import render_image, RENDITION_WIDTHS
+
+    path = tmp_path / "abc123.png"
+    Image.new("RGB", (800, 400), (0, 128, 255)).save(path)
+
+    renditions = render_image(str(path))
+    assert set(renditions) == set(RENDITION_WIDTHS)
+    # Never upscaled past the original width
+    assert renditions["detail"]["width"] == 800
+    assert renditions["thumbnail"]["width"] == 160
+
+    with Image.open(tmp_path / renditions["card"]["filename"]) as card:
+        assert card.size == (480, 240)
+    with Image.open(tmp_path / renditions["card"]["webp_filename"]) as webp:
+        assert webp.format == "WEBP"
+
+@pytest.mark.asyncio
+async def test_catalog_conditional_get(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    created = (await client.post("/products/", json={
+        "title": "ETag", "description": "D", "base_price": 10.0, "slug": "etag-shirt",
+        "variants": [{"sku": "ETAG-M", "size": "M", "color": "Red", "stock_quantity": 5}]
+    }, headers=headers)).json()
+
+    response = await client.get("/products/etag-shirt")
+    etag = response.headers["etag"]
+
+    response = await client.get("/products/etag-shirt", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    response = await client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    # The tag is catalog-wide; it must not turn a missing product into a 304
+    response = await client.get("/products/no-such-shirt", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+    response = await client.get("/products/", params={"cursor": "not-a-cursor"}, headers={"If-None-Match": etag})
+    assert response.status_code == 400
+
+    # Any product write changes the tag
+    await client.put(f"/products/{created['_id']}", json={"title": "ETag 2"}, headers=headers)
+    response = await client.get("/products/etag-shirt", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "ETag 2"
+    assert response.headers["etag"] != etag
+
+def test_etag_matches():
+    from app.core.conditional import etag_matches
+
+    assert etag_matches('W/"3.1"', 'W/"3.1"')
+    assert etag_matches('"3.1"', 'W/"3.1"')
+    assert etag_matches('W/"2.1", W/"3.1"', 'W/"3.1"')
+    assert etag_matches("*", 'W/"3.1"')
+    assert not etag_matches('W/"2.1"', 'W/"3.1"')
+    assert not etag_matches(None, 'W/"3.1"')
+
+@pytest.mark.asyncio
+async def test_import_and_export_ndjson(client: AsyncClient, admin_token: str):
+    import json
+    headers = {"Authorization": f"Bearer {admin_token}", "Content-Type": "application/x-ndjson"}
+    line = lambda slug, sku: json.dumps({
+        "title": slug, "description": "D", "base_price": "10.00", "slug": slug,
+        "variants": [{"sku": sku, "size": "M", "color": "Red", "stock_quantity": 5}]
+    })
+    body = "\n".join([line("bulk-1", "BULK-1"), "{not json", line("bulk-2", "BULK-2"), line("bulk-3", "BULK-1")])
+
+    response = await client.post("/products/import", content=body, headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["updated"], result["failed"]) == (2, 0, 2)
+    assert [e["line"] for e in result["errors"]] == [2, 4]
+    assert "BULK-1" in result["errors"][1]["error"]
+
+    # Importing again updates in place
+    response = await client.post("/products/import", content=line("bulk-2", "BULK-2B"), headers=headers)
+    assert (response.json()["created"], response.json()["updated"]) == (0, 1)
+    assert (await client.get("/products/bulk-2")).json()["variants"][0]["sku"] == "BULK-2B"
+
+    response = await client.get("/products/export", headers=headers)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(l) for l in response.text.splitlines()]
+    assert [p["slug"] for p in exported] == ["bulk-1", "bulk-2"]
+
+@pytest.mark.asyncio
+async def test_ndjson_lines():
+    from app.product.bulk import ndjson_lines
+    from app.core.config import get_settings
+
+    async def chunks():
+        for chunk in (b'{"a"', b': 1}\n\n{"b": 2}\n', b"x" * (get_settings().PRODUCT_IMPORT_MAX_LINE_BYTES + 1), b"\n{}"):
+            yield chunk
+
+    lines = [item async for item in ndjson_lines(chunks())]
+    assert lines == [(1, b'{"a": 1}'), (3, b'{"b": 2}'), (4, None), (5, b"{}")]
@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime
+from fastapi import HTTPException
+from httpx import AsyncClient
+from app.auth import router as auth_router
+from app.core.config import get_settings
+from app.core.ratelimit import (
+    ConcurrencyLimit, MemoryBuckets, MongoBuckets, RateLimit, RateLimitBucket, RateLimiter,
+    get_bucket_store, parse_rate, take_token,
+)
+
+settings = get_settings()
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == RateLimit(10, 10 / 60)
+    assert parse_rate("") is None
+    assert parse_rate("0/second") is None
+    with pytest.raises(ValueError):
+        parse_rate("10/fortnight")
+
+def test_take_token_refills_evenly():
+    limit = RateLimit(2, 1.0)
+    decision, tokens = take_token(1, 0, limit)
+    assert decision.allowed and tokens == 0
+
+    decision, tokens = take_token(0, 0.25, limit)
+    assert not decision.allowed
+    assert decision.retry_after == pytest.approx(0.75)
+
+    # Never refills past the burst size
+    decision, tokens = take_token(0, 60, limit)
+    assert decision.allowed and tokens == 1
+
+@pytest.mark.asyncio
+async def test_memory_buckets_are_per_key():
+    buckets = MemoryBuckets(max_entries=100)
+    limit = RateLimit(2, 0.001)
+    assert [(await buckets.take("a", limit)).allowed for _ in range(3)] == [True, True, False]
+    assert (await buckets.take("b", limit)).allowed
+
+@pytest.fixture
+async def mongo_buckets(test_db, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "mongo")
+    get_bucket_store.cache_clear()
+    yield get_bucket_store()
+    get_bucket_store.cache_clear()
+
+@pytest.mark.asyncio
+async def test_mongo_buckets_are_shared_and_expire(mongo_buckets):
+    assert isinstance(mongo_buckets, MongoBuckets)
+    limit = RateLimit(2, 0.01)
+
+    decisions = [await mongo_buckets.take("test:a", limit) for _ in range(3)]
+    assert [d.allowed for d in decisions] == [True, True, False]
+    # About 1 / 0.01 seconds until the next token
+    assert 90 < decisions[2].retry_after <= 100
+    assert (await mongo_buckets.take("test:b", limit)).allowed
+
+    # Deleted by the TTL index once it would be full again
+    bucket = await RateLimitBucket.get_motor_collection().find_one({"_id": "test:a"})
+    assert bucket["tokens"] < 1
+    assert bucket["expires_at"] > datetime.utcnow()
+
+@pytest.mark.asyncio
+async def test_rate_limiter_raises_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    limiter = RateLimiter("test", "1/hour")
+    await limiter.check("203.0.113.7")
+    with pytest.raises(HTTPException) as exc:
+        await limiter.check("203.0.113.7")
+    assert exc.value.status_code == 429
+    assert 3500 < int(exc.value.headers["Retry-After"]) <= 3600
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    await limiter.check("203.0.113.7")
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_sheds_with_503():
+    limit = ConcurrencyLimit("test", max_in_flight=1)
+    first = limit()
+    await first.__anext__()
+    with pytest.raises(HTTPException) as exc:
+        await limit().__anext__()
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+
+    await first.aclose()
+    assert limit.in_flight == 0
+    assert limit.stats()["shed"] == 1
+
+@pytest.mark.asyncio
+async def test_login_is_rate_limited_per_account(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(auth_router.login_account_limit, "limit", RateLimit(2, 0.001))
+    form = {"username": "victim@example.com", "password": "guess"}
+
+    codes = [(await client.post("/auth/token", data=form)).status_code for _ in range(3)]
+    assert codes == [401, 401, 429]
@@ -0,0 +1,48 @@
+import gzip
+import pytest
+from httpx import AsyncClient, ASGITransport
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from app.core.static import CachedStaticFiles, IMMUTABLE_CACHE_CONTROL
+
+HASHED = "a" * 64
+
+def make_client(tmp_path) -> AsyncClient:
+    (tmp_path / f"{HASHED}.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+    (tmp_path / "legacy.jpg").write_bytes(b"\xff\xd8\xff" + b"\x00" * 32)
+    (tmp_path / f"{HASHED}.js").write_bytes(b"console.log('hi');" * 10)
+    (tmp_path / f"{HASHED}.js.gz").write_bytes(gzip.compress(b"console.log('hi');" * 10))
+    app = Starlette(routes=[Mount("/static", CachedStaticFiles(directory=str(tmp_path)))])
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_hashed_files_are_immutable_with_strong_etag(tmp_path):
+    client = make_client(tmp_path)
+    response = await client.get(f"/static/{HASHED}.png")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["etag"] == f'"{HASHED}.png"'
+
+    response = await client.get(f"/static/{HASHED}.png", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+    assert response.content == b""
+
+@pytest.mark.asyncio
+async def test_unhashed_files_get_short_max_age(tmp_path):
+    client = make_client(tmp_path)
+    response = await client.get("/static/legacy.jpg")
+    assert response.status_code == 200
+    assert "immutable" not in response.headers["cache-control"]
+
+@pytest.mark.asyncio
+async def test_precompressed_sidecar(tmp_path):
+    client = make_client(tmp_path)
+    plain = await client.get(f"/static/{HASHED}.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    compressed = await client.get(f"/static/{HASHED}.js", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    # httpx decodes the body transparently
+    assert compressed.content == plain.content